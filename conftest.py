@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings):
+    """Settings core.runner applies to manage.py test runs."""
+    from core.runner import TEST_SETTINGS
+
+    for name, value in TEST_SETTINGS.items():
+        setattr(settings, name, value)
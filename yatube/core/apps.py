@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import loaders, metrics, sqlite  # noqa: F401
+        metrics.install()
+        if settings.TEMPLATES_PRODUCTION:
+            loaders.warm()
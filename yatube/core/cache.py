@@ -0,0 +1,391 @@
+"""Cache backends shared by the worker processes of one host.
+
+SQLiteCache keeps entries in a SQLite file, so every process reads what
+any of them computed, without an external service. TwoTierCache puts a
+small in-process LRU in front of such a shared cache. Deletes, incr
+and clear bump a generation key in the shared tier, other processes
+notice the new generation within SYNC_INTERVAL seconds and drop their
+local entries. Plain writes do not, they are mostly new keys: fragments
+and pages are keyed by versions that incr moves.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Stay below SQLITE_MAX_VARIABLE_NUMBER in get_many and delete_many.
+_BATCH = 500
+
+CULL_EVERY = 100
+
+_missing = object()
+
+
+class SQLiteCache(BaseCache):
+    """Cache in the SQLite file named by LOCATION.
+
+    The file is in WAL mode, so reads go on while another process writes.
+    incr is one transaction, atomic across processes, which version keys
+    rely on.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def db(self):
+        # One connection per thread, and new ones in forked workers.
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=wal')
+            db.execute('PRAGMA synchronous=normal')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _write(self, sql, params=()):
+        return self.db.execute(sql, params).rowcount
+
+    def get(self, key, default=None, version=None):
+        row = self.db.execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(keys)
+        for start in range(0, len(names), _BATCH):
+            batch = names[start:start + _BATCH]
+            rows = self.db.execute(
+                'SELECT key, value FROM cache WHERE key IN ({}) '
+                'AND (expires IS NULL OR expires > ?)'.format(
+                    ', '.join('?' * len(batch))
+                ),
+                (*batch, time.time()),
+            )
+            for name, value in rows:
+                found[keys[name]] = pickle.loads(value)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+            (self._key(key, version), _dumps(value), self._expires(timeout)),
+        )
+        self._cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        with self._transaction():
+            self.db.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+                [
+                    (self._key(key, version), _dumps(value), expires)
+                    for key, value in data.items()
+                ],
+            )
+        self._cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction():
+            self.db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            added = self._write(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?)',
+                (key, _dumps(value), self._expires(timeout)),
+            )
+        self._cull()
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self._write(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), self._key(key, version), time.time()),
+        ))
+
+    def delete(self, key, version=None):
+        return bool(self._write(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        ))
+
+    def delete_many(self, keys, version=None):
+        names = [self._key(key, version) for key in keys]
+        with self._transaction():
+            for start in range(0, len(names), _BATCH):
+                batch = names[start:start + _BATCH]
+                self.db.execute(
+                    'DELETE FROM cache WHERE key IN ({})'.format(
+                        ', '.join('?' * len(batch))
+                    ),
+                    batch,
+                )
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction():
+            row = self.db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            self._write(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (_dumps(value), key),
+            )
+        return value
+
+    def clear(self):
+        self._write('DELETE FROM cache')
+
+    def _transaction(self):
+        return _Immediate(self.db)
+
+    def _cull(self):
+        """Keep about MAX_ENTRIES rows, expired and oldest go first.
+
+        Counting rows reads the whole table, so it is done only every
+        CULL_EVERY writes of a process.
+        """
+        self._writes += 1
+        if self._writes % CULL_EVERY:
+            return
+        self._write('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = self.db.execute('SELECT count(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            self.clear()
+            return
+        # Down to MAX_ENTRIES, and 1 / CULL_FREQUENCY of them on top, so
+        # the next writes have room.
+        excess = count - self._max_entries
+        excess += self._max_entries // self._cull_frequency
+        self._write(
+            'DELETE FROM cache WHERE rowid IN ('
+            'SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+            (excess,),
+        )
+
+
+class _Immediate:
+    """Write transaction that takes the lock at once, not on first write."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def _dumps(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+class TwoTierCache(BaseCache):
+    """In-process LRU in front of the shared cache LOCATION names.
+
+    OPTIONS: MAX_ENTRIES bounds the local tier, SYNC_INTERVAL is how
+    often, in seconds, the shared generation is checked. A process sees
+    its own writes at once, deletes and increments of others within
+    SYNC_INTERVAL. A value another process overwrote with set is seen
+    once the local entry expires: local entries live at most TIMEOUT
+    seconds, whatever the timeout of the shared entry, keep it short.
+    """
+    GENERATION_KEY = 'two_tier:generation'
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.shared_alias = location
+        options = params.get('OPTIONS', {})
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._next_sync = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    # Local tier, values are pickled like LocMemCache does, so callers
+    # never share mutable objects.
+
+    def _local_get(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return _missing
+            expires, value = entry
+            if expires is not None and expires <= time.time():
+                del self._entries[name]
+                return _missing
+            self._entries.move_to_end(name)
+        return pickle.loads(value)
+
+    def _local_set(self, name, value, timeout=DEFAULT_TIMEOUT):
+        expires = self.get_backend_timeout(timeout)
+        longest = self.get_backend_timeout()
+        if expires is None or longest is not None and longest < expires:
+            expires = longest
+        entry = (expires, _dumps(value))
+        with self._lock:
+            self._entries[name] = entry
+            self._entries.move_to_end(name)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def _local_delete(self, *names):
+        with self._lock:
+            for name in names:
+                self._entries.pop(name, None)
+
+    # Generations.
+
+    def _sync(self):
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+        generation = self.shared.get(self.GENERATION_KEY)
+        if generation != self._generation:
+            self._clear_local(generation)
+
+    def _clear_local(self, generation):
+        with self._lock:
+            self._entries.clear()
+        self._generation = generation
+
+    def _bump(self):
+        """Tell other processes to drop their local entries."""
+        try:
+            generation = self.shared.incr(self.GENERATION_KEY)
+        except ValueError:
+            # Time based, never back to a value seen before an eviction.
+            seed = int(time.time() * 1000)
+            self.shared.add(self.GENERATION_KEY, seed, None)
+            generation = self.shared.get(self.GENERATION_KEY)
+            self._clear_local(generation)
+            return
+        if self._generation is not None and generation == self._generation + 1:
+            self._generation = generation
+        else:
+            # Somebody else wrote since the last sync.
+            self._clear_local(generation)
+
+    # Cache API.
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        name = self.make_key(key, version=version)
+        value = self._local_get(name)
+        if value is _missing:
+            value = self.shared.get(key, _missing, version=version)
+            if value is _missing:
+                return default
+            self._local_set(name, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, remote = {}, []
+        for key in keys:
+            value = self._local_get(self.make_key(key, version=version))
+            if value is _missing:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            for key, value in fetched.items():
+                self._local_set(self.make_key(key, version=version), value)
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(self.make_key(key, version=version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(
+                    self.make_key(key, version=version), value, timeout
+                )
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._local_set(
+                self.make_key(key, version=version), value, timeout
+            )
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self.make_key(key, version=version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_key(key, version=version))
+        deleted = self.shared.delete(key, version=version)
+        self._bump()
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._local_delete(*(self.make_key(key, version) for key in keys))
+        self.shared.delete_many(keys, version=version)
+        self._bump()
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self.make_key(key, version=version))
+        value = self.shared.incr(key, delta, version=version)
+        self._bump()
+        return value
+
+    def clear(self):
+        self.shared.clear()
+        self._bump()
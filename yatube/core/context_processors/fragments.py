@@ -0,0 +1,8 @@
+from django.conf import settings
+
+
+def header(request):
+    """Добавляет время жизни кэша шапки сайта."""
+    return {
+        'header_timeout': settings.HEADER_FRAGMENT_TIMEOUT
+    }
@@ -0,0 +1,77 @@
+"""Per-user holes in pages and fragments shared by all users.
+
+The hole template tag renders a signed placeholder naming a template and
+its context instead of the user specific markup, so whatever contains it
+can be cached once for everybody. HoleMiddleware renders the templates
+into the placeholders of every HTML response, for the user of the
+request, after any cache the response came from.
+"""
+import json
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.template import Context
+from django.template.loader import get_template
+
+MARKER = b'<!--hole:'
+PATTERN = re.compile(r'<!--hole:([\w-]+:[\w-]+)-->')
+
+_signer = signing.Signer(salt='core.holes')
+
+
+def placeholder(template_name, values):
+    """Placeholder for template_name rendered with JSON values."""
+    data = json.dumps([template_name, values], sort_keys=True)
+    token = _signer.sign(signing.b64_encode(data.encode()).decode())
+    return f'<!--hole:{token}-->'
+
+
+def fill(content, request):
+    """Render the holes of content for the user of request.
+
+    Hole templates see their values, request and user, and no context
+    processors. Placeholders with a bad signature are dropped.
+    """
+    context = Context({
+        'request': request,
+        'user': getattr(request, 'user', None) or AnonymousUser(),
+    })
+    rendered = {}
+
+    def render(match):
+        token = match.group(1)
+        if token not in rendered:
+            try:
+                data = signing.b64_decode(_signer.unsign(token).encode())
+            except signing.BadSignature:
+                return ''
+            template_name, values = json.loads(data)
+            template = get_template(template_name).template
+            with context.push(values):
+                rendered[token] = template.render(context)
+        return rendered[token]
+
+    return PATTERN.sub(render, content)
+
+
+class HoleMiddleware:
+    """Fill the holes of HTML responses, keep it last in MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or not response.get('Content-Type', '').startswith('text/html')
+            or MARKER not in response.content
+        ):
+            return response
+        response.content = fill(
+            response.content.decode(response.charset), request
+        )
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        return response
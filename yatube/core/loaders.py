@@ -0,0 +1,143 @@
+"""Template loading for production.
+
+Loader is Django's cached loader that also inlines small includes with
+a constant name: the include tag is replaced by the nodes of the
+included template, parsed once, so rendering it costs no name lookup
+and no template loading. warm() parses every template up front, so
+the first requests of a process do not pay for it.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.template import (TemplateDoesNotExist, TemplateSyntaxError,
+                             engines)
+from django.template.base import Node
+from django.template.defaulttags import IfNode
+from django.template.loader_tags import BlockNode, ExtendsNode, IncludeNode
+from django.template.loaders import cached
+
+from . import metrics
+
+
+class InlinedIncludeNode(Node):
+    """Include tag with the nodes of its template in place."""
+    child_nodelists = ('nodelist',)
+
+    def __init__(self, include, template):
+        self.token = include.token
+        self.origin = include.origin
+        self.template = template
+        self.nodelist = template.nodelist
+        self.extra_context = include.extra_context
+        self.isolated_context = include.isolated_context
+
+    def render(self, context):
+        values = {
+            name: var.resolve(context)
+            for name, var in self.extra_context.items()
+        }
+        # Same state and context handling as IncludeNode.
+        name = self.template.origin.template_name
+        with metrics.timed_template(name):
+            with context.render_context.push_state(self.template):
+                if self.isolated_context:
+                    return self.nodelist.render(context.new(values))
+                with context.push(**values):
+                    return self.nodelist.render(context)
+
+
+class Loader(cached.Loader):
+    """Cached loader inlining includes of small templates.
+
+    Templates up to settings.TEMPLATE_INLINE_MAX_SIZE characters are
+    inlined, unless they have blocks, which would mix with the blocks of
+    the including template, or extend another template.
+    """
+
+    def __init__(self, engine, loaders):
+        super().__init__(engine, loaders)
+        self._lock = threading.RLock()
+
+    def get_template(self, template_name, skip=None):
+        template = super().get_template(template_name, skip)
+        if not getattr(template, 'includes_inlined', False):
+            with self._lock:
+                self._inline_template(template, ())
+        return template
+
+    def _inline_template(self, template, loading):
+        if getattr(template, 'includes_inlined', False):
+            return
+        # Templates including themselves stay includes.
+        loading += (template.origin.template_name,)
+        self._inline(template.nodelist, loading)
+        template.includes_inlined = True
+
+    def _inline(self, nodelist, loading):
+        for index, node in enumerate(nodelist):
+            if isinstance(node, IncludeNode):
+                template = self._included(node, loading)
+                if template is not None:
+                    nodelist[index] = InlinedIncludeNode(node, template)
+                continue
+            if isinstance(node, IfNode):
+                children = [child for _, child in node.conditions_nodelists]
+            else:
+                children = [
+                    getattr(node, name, None) for name in node.child_nodelists
+                ]
+            for child in children:
+                if child:
+                    self._inline(child, loading)
+
+    def _included(self, node, loading):
+        """Template the include tag node loads, if it can be inlined."""
+        name = node.template.var
+        if node.template.filters or not isinstance(name, str):
+            return None
+        if name in loading:
+            return None
+        try:
+            template = super().get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            # Left to the include tag to raise when rendered.
+            return None
+        if len(template.source) > settings.TEMPLATE_INLINE_MAX_SIZE:
+            return None
+        self._inline_template(template, loading)
+        if template.nodelist.get_nodes_by_type((BlockNode, ExtendsNode)):
+            return None
+        return template
+
+
+def template_dirs(engine):
+    dirs = []
+    for loader in engine.template_loaders:
+        for source in getattr(loader, 'loaders', [loader]):
+            # The locmem loader has no directories.
+            dirs.extend(getattr(source, 'get_dirs', list)())
+    return dirs
+
+
+def warm(engine=None):
+    """Load every template the engine finds, return their names.
+
+    Files which are not valid templates, like some static files apps
+    keep next to their templates, are skipped.
+    """
+    engine = engine or engines['django'].engine
+    names = set()
+    for directory in template_dirs(engine):
+        for root, _, files in os.walk(directory):
+            for file in files:
+                path = os.path.join(root, file)
+                name = os.path.relpath(path, directory).replace(os.sep, '/')
+                if name in names:
+                    continue
+                try:
+                    engine.get_template(name)
+                except (TemplateSyntaxError, UnicodeDecodeError):
+                    continue
+                names.add(name)
+    return sorted(names)
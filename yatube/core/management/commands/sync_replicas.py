@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.replicas import replicate, replicated
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the default SQLite database into every replica, a stand-in '
+        'for real replication.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Keep copying every this many seconds.',
+        )
+
+    def handle(self, *args, **options):
+        aliases = ['default'] + list(settings.DATABASE_REPLICAS)
+        for alias in aliases:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias} is not an SQLite database.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas in DATABASE_REPLICAS.')
+
+        while True:
+            self.sync()
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self):
+        source = connections['default'].settings_dict['NAME']
+        for alias in settings.DATABASE_REPLICAS:
+            # Replicas read by this process would keep the old snapshot.
+            connections[alias].close()
+            replicate(source, connections[alias].settings_dict['NAME'])
+        replicated.send(sender=self.__class__)
+        self.stdout.write(
+            f'Copied {source} to {len(settings.DATABASE_REPLICAS)} replicas.'
+        )
@@ -0,0 +1,365 @@
+"""Always-on request metrics.
+
+MetricsMiddleware measures every request: wall time, number and time of
+database queries, template render time, cache hits and misses and the
+requests core.singleflight served without computing. They
+are aggregated per view into fixed bucket histograms, so recording is a
+few additions under a lock and memory does not grow with traffic.
+
+Render time is also kept per template, included ones and those
+core.loaders inlined too, as the time a request spent in each of them,
+with the templates it includes.
+
+Metrics live in the memory of each process, every worker reports its own.
+"""
+import bisect
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.template.base import Template
+from django.utils.module_loading import import_string
+
+# Upper bounds of histogram buckets, the last one catches the rest.
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1, 2.5, 5, 10, float('inf'),
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, float('inf'))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Counts of observations per bucket, with their sum."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile, interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0
+        for upper, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                if upper == float('inf'):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return lower
+
+
+class ViewMetrics:
+    """Everything recorded for one view."""
+
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.db_time = Histogram(SECONDS_BUCKETS)
+        self.db_queries = Histogram(COUNT_BUCKETS)
+        self.template_time = Histogram(SECONDS_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+
+    def histograms(self):
+        return (
+            ('request_duration_seconds', self.duration),
+            ('db_duration_seconds', self.db_time),
+            ('db_queries', self.db_queries),
+            ('template_duration_seconds', self.template_time),
+        )
+
+
+_views = {}
+_templates = {}
+
+
+class RequestStats:
+    """Counters of the request being served by this thread."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.template_time = 0
+        self.template_depth = 0
+        self.templates = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_depth = 0
+        self.coalesced = 0
+
+
+def current():
+    """Stats of the current request, None outside of one."""
+    return getattr(_local, 'stats', None)
+
+
+def count_coalesced():
+    """A value was taken from another caller's computation."""
+    stats = current()
+    if stats is not None:
+        stats.coalesced += 1
+
+
+def record(view, stats, duration):
+    with _lock:
+        metrics = _views.get(view)
+        if metrics is None:
+            metrics = _views[view] = ViewMetrics()
+        metrics.duration.observe(duration)
+        metrics.db_time.observe(stats.db_time)
+        metrics.db_queries.observe(stats.queries)
+        metrics.template_time.observe(stats.template_time)
+        metrics.cache_hits += stats.cache_hits
+        metrics.cache_misses += stats.cache_misses
+        metrics.coalesced += stats.coalesced
+        for name, seconds in stats.templates.items():
+            histogram = _templates.get(name)
+            if histogram is None:
+                histogram = _templates[name] = Histogram(SECONDS_BUCKETS)
+            histogram.observe(seconds)
+
+
+def snapshot():
+    """Per view quantiles and totals, busiest views first."""
+    rows = []
+    with _lock:
+        for view, metrics in _views.items():
+            row = {
+                'view': view,
+                'requests': metrics.duration.count,
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                'coalesced': metrics.coalesced,
+            }
+            for name, histogram in metrics.histograms():
+                row[name] = [histogram.quantile(q) for q in QUANTILES]
+            rows.append(row)
+    return sorted(rows, key=lambda row: -row['requests'])
+
+
+def template_snapshot():
+    """Per template quantiles and totals, most expensive first."""
+    with _lock:
+        rows = [
+            {
+                'template': name,
+                'requests': histogram.count,
+                'seconds': histogram.sum,
+                'render_duration_seconds': [
+                    histogram.quantile(q) for q in QUANTILES
+                ],
+            }
+            for name, histogram in _templates.items()
+        ]
+    return sorted(rows, key=lambda row: -row['seconds'])
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def _histogram_lines(lines, metric, label, histogram):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+            metric, label, _format_bound(bound), cumulative
+        ))
+    lines.append(f'{metric}_sum{{{label}}} {histogram.sum}')
+    lines.append(f'{metric}_count{{{label}}} {histogram.count}')
+
+
+def prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        views = sorted(_views.items())
+        for name, _ in ViewMetrics().histograms():
+            metric = f'yatube_{name}'
+            lines.append(f'# TYPE {metric} histogram')
+            for view, metrics in views:
+                histogram = dict(metrics.histograms())[name]
+                label = 'view="{}"'.format(view.replace('"', '\\"'))
+                _histogram_lines(lines, metric, label, histogram)
+        for name in ('cache_hits', 'cache_misses', 'coalesced'):
+            metric = f'yatube_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for view, metrics in views:
+                label = 'view="{}"'.format(view.replace('"', '\\"'))
+                lines.append(
+                    f'{metric}{{{label}}} {getattr(metrics, name)}'
+                )
+        metric = 'yatube_template_render_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        for name, histogram in sorted(_templates.items()):
+            label = 'template="{}"'.format(name.replace('"', '\\"'))
+            _histogram_lines(lines, metric, label, histogram)
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        _views.clear()
+        _templates.clear()
+
+
+def _query_timer(execute, sql, params, many, context):
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+@contextmanager
+def timed_template(name):
+    """Add the time of the block to the template name of the request."""
+    stats = current()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.templates[name] = stats.templates.get(name, 0) + elapsed
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        stats = current()
+        if stats is None:
+            return render(self, context)
+        # Included templates are already inside the outermost render, they
+        # only count for themselves.
+        outermost = not stats.template_depth
+        name = self.origin.template_name or self.origin.name
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            with timed_template(name):
+                return render(self, context)
+        finally:
+            if outermost:
+                stats.template_time += time.perf_counter() - start
+            stats.template_depth -= 1
+    wrapper.metrics_wrapped = True
+    return wrapper
+
+
+_missing = object()
+
+
+def _counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        stats = current()
+        if stats is None or stats.cache_depth:
+            return get(self, key, default, version)
+        # Two tier caches call their shared tier, and BaseCache.get_many
+        # calls get per key, only the outermost call is counted.
+        stats.cache_depth += 1
+        try:
+            value = get(self, key, _missing, version)
+        finally:
+            stats.cache_depth -= 1
+        if value is _missing:
+            stats.cache_misses += 1
+        else:
+            stats.cache_hits += 1
+        return default if value is _missing else value
+    wrapper.metrics_wrapped = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        stats = current()
+        if stats is None or stats.cache_depth:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        stats.cache_depth += 1
+        try:
+            values = get_many(self, keys, version)
+        finally:
+            stats.cache_depth -= 1
+        stats.cache_hits += len(values)
+        stats.cache_misses += len(keys) - len(values)
+        return values
+    wrapper.metrics_wrapped = True
+    return wrapper
+
+
+def _wrap(cls, name, decorator):
+    method = getattr(cls, name)
+    if not getattr(method, 'metrics_wrapped', False):
+        setattr(cls, name, decorator(method))
+
+
+def install():
+    """Hook template rendering and configured cache backends."""
+    _wrap(Template, 'render', _timed_render)
+    _install_caches()
+
+
+def _install_caches():
+    for config in settings.CACHES.values():
+        backend = import_string(config['BACKEND'])
+        _wrap(backend, 'get', _counted_get)
+        _wrap(backend, 'get_many', _counted_get_many)
+
+
+@receiver(setting_changed)
+def _caches_changed(setting, **kwargs):
+    # Tests swap the cache backends.
+    if setting == 'CACHES':
+        _install_caches()
+
+
+class MetricsMiddleware:
+    """Record metrics of every request, keep it first in MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = _local.stats = RequestStats()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_query_timer)
+                    )
+                response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            _local.stats = None
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        record(view, stats, duration)
+        return response
@@ -0,0 +1,104 @@
+"""Read replicas with read-your-writes.
+
+ReplicaRouter sends reads of requests to a random alias from
+settings.DATABASE_REPLICAS and every write to default. A client that has
+just written is pinned to default for settings.REPLICA_PIN_SECONDS by a
+cookie, so it never reads a replica that has not caught up with its own
+write yet. Code running outside of requests, like management commands,
+always reads default.
+
+Whatever a request reading replicas renders may miss the latest writes,
+caches shared with pinned clients must keep it apart, see
+reads_replica(). sync_replicas sends replicated after every copy.
+"""
+import random
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+
+PIN_COOKIE = 'pin_primary'
+
+# Sent once the replicas have caught up with default.
+replicated = Signal()
+
+_state = threading.local()
+
+
+def pin():
+    """Read from default for the rest of this request and the window."""
+    _state.replica_reads = False
+    _state.wrote = True
+
+
+def replica_reads():
+    return getattr(_state, 'replica_reads', False)
+
+
+def reads_replica():
+    """True when this request may read data older than its own writes."""
+    return bool(settings.DATABASE_REPLICAS) and replica_reads()
+
+
+class ReplicaRouter:
+    """Reads from replicas, writes to default."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or not replica_reads()
+                or connections['default'].in_atomic_block):
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as default.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaPinMiddleware:
+    """Pin clients to default for a while after they write."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica_reads = (
+            PIN_COOKIE not in request.COOKIES
+            and request.method in ('GET', 'HEAD', 'OPTIONS')
+        )
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                response.set_cookie(
+                    PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        finally:
+            _state.replica_reads = _state.wrote = False
+        return response
+
+
+def replicate(source, target):
+    """Copy a consistent snapshot of SQLite file source into target."""
+    source_db = sqlite3.connect(source)
+    target_db = sqlite3.connect(target)
+    try:
+        source_db.backup(target_db)
+    finally:
+        target_db.close()
+        source_db.close()
@@ -0,0 +1,27 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+TEST_SETTINGS = {
+    # No thumbnail worker may still write files once a test has cleaned
+    # up its media directory, see posts.thumbnails.
+    'THUMBNAIL_WORKERS': 0,
+    # Tests clear the cache, keep them off the file a running server uses.
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    },
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Test runner applying TEST_SETTINGS to the whole run."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**TEST_SETTINGS)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,147 @@
+"""Single flight caching with stale-while-revalidate.
+
+When a cached value is missing or stale, the first caller takes a lock
+in the cache and computes it. Meanwhile the others get the stale value,
+or, when there is none, wait for the first caller's result instead of
+computing it too. The lock is a cache.add, so with a cache shared by the
+worker processes, see core.cache, requests of all of them are coalesced.
+A caller that waited in vain, because the holder failed or outlived
+LOCK_TIMEOUT, tries to take the lock over; only the caller whose token
+the lock holds releases it.
+"""
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import caches
+
+from . import metrics, replicas
+from .cache import TwoTierCache
+
+# Longest a computation may hold its lock, and how long others wait.
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=0, version=None,
+                   cache=None):
+    """Cached result of compute(), computed by one caller at a time.
+
+    The value is fresh for timeout seconds while version stays the same,
+    then served stale for up to stale_timeout seconds more while one
+    caller recomputes it. Any picklable value works, like list(queryset).
+    """
+    return _get_or_compute(
+        key, compute, timeout, stale_timeout, version, cache
+    )[0]
+
+
+def _get_or_compute(key, compute, timeout, stale_timeout, version, cache):
+    """get_or_compute, as (value, whether it is stale)."""
+    cache = cache or caches['default']
+    entry = cache.get(key)
+    if entry is not None and _fresh(entry, version):
+        return entry[0], False
+
+    # Locks skip the local tier of two tier caches: they are shared
+    # state, and their deletes would flush every process.
+    shared = cache.shared if isinstance(cache, TwoTierCache) else cache
+    lock = f'{key}:lock'
+    token = uuid.uuid4().hex
+    while not shared.add(lock, token, LOCK_TIMEOUT):
+        if entry is not None:
+            metrics.count_coalesced()
+            return entry[0], True
+        value = _wait(shared, key, lock, version)
+        if value is not _missing:
+            metrics.count_coalesced()
+            return value, False
+    try:
+        value = compute()
+        cache.set(
+            key, (value, time.time() + timeout, version),
+            timeout + stale_timeout,
+        )
+    finally:
+        _release(shared, lock, token)
+    return value, False
+
+
+_missing = object()
+
+
+def _fresh(entry, version):
+    _, fresh_until, entry_version = entry
+    return entry_version == version and time.time() < fresh_until
+
+
+def _release(cache, lock, token):
+    """Delete lock unless it expired and another caller took it.
+
+    Not atomic, a lock taken over between the two calls is deleted all
+    the same; at worst one more caller computes.
+    """
+    if cache.get(lock) == token:
+        cache.delete(lock)
+
+
+def _wait(cache, key, lock, version):
+    """Value computed by the lock holder, _missing if it gave up."""
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[2] == version:
+            return entry[0]
+        if not cache.has_key(lock):
+            break
+    return _missing
+
+
+def coalesce_view(timeout, stale_timeout=0, version=None):
+    """Cache the responses of a view to guests with get_or_compute.
+
+    version(), when given, is called per request, a new version makes
+    cached responses stale. Pages of logged in users, requests other
+    than GET and responses other than 200 are never cached, pages read
+    from replicas are cached apart, see core.replicas. Stale
+    responses have a true stale attribute: validators of the current
+    version must not be sent with them.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            key = 'singleflight:view:{}:{}'.format(
+                view.__module__ + '.' + view.__name__,
+                request.get_full_path(),
+            )
+            if replicas.reads_replica():
+                # Pages of replicas may miss writes of pinned clients.
+                key += ':replica'
+            failed = []
+
+            def compute():
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.cookies:
+                    # Raising keeps it out of the cache.
+                    failed.append(response)
+                    raise _Uncacheable
+                return response
+
+            try:
+                response, stale = _get_or_compute(
+                    key, compute, timeout, stale_timeout,
+                    version() if version else None, None,
+                )
+            except _Uncacheable:
+                return failed[0]
+            response.stale = stale
+            return response
+        return wrapper
+    return decorator
+
+
+class _Uncacheable(Exception):
+    pass
@@ -0,0 +1,30 @@
+"""SQLite connection tuning.
+
+Every new SQLite connection gets the pragmas of settings.SQLITE_PRAGMAS.
+In production mode they switch the database to WAL, so readers never
+wait for a writer and writers do not fsync every commit, and give
+connections a bigger page cache, memory mapped reads and a busy timeout
+instead of failing at once with 'database is locked'.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def pragmas(connection):
+    """Current values of the configured pragmas of a connection."""
+    values = {}
+    with connection.cursor() as cursor:
+        for name in settings.SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+    return values
@@ -0,0 +1,51 @@
+"""Content addressed file storage.
+
+Files are named by the sha256 of their content, in the directory they
+were uploaded to: posts/photo.jpg becomes posts/3f/3fa9...c2.jpg. The
+same image uploaded twice is stored once, and thumbnailed once, since
+sorl keys thumbnails by the source name. A name never changes content,
+so its URL can be cached forever, see core.views.media.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Names of content addressed files and of sorl thumbnails, which are
+# named by a hash of their source name and options.
+IMMUTABLE_NAME = re.compile(r'(^|/)[0-9a-f]{32}([0-9a-f]{32})?\.\w+$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage keeping one file per distinct content."""
+
+    def hashed_name(self, name, content):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        # A concurrent upload of the same file may still win the race,
+        # its copy then gets a suffix like any clashing name.
+        return super().save(name, content, max_length)
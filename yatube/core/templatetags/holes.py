@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.holes import placeholder
+
+register = template.Library()
+
+
+@register.simple_tag
+def hole(template_name, **values):
+    """Leave template_name to be rendered per user, see core.holes."""
+    return mark_safe(placeholder(template_name, values))
@@ -0,0 +1,656 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.template import Context, Engine
+from django.template.loader_tags import IncludeNode
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+
+from posts.models import Post, User
+
+from . import (holes, loaders, metrics, replicas, singleflight, sqlite,
+               views)
+from .cache import SQLiteCache, TwoTierCache
+from .storage import ContentAddressedStorage
+
+PRODUCTION_TEMPLATES = [dict(
+    settings.TEMPLATES[0],
+    APP_DIRS=False,
+    OPTIONS=dict(settings.TEMPLATES[0]['OPTIONS'], loaders=[
+        ('core.loaders.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]),
+)]
+
+
+class HistogramTests(TestCase):
+    def test_quantiles(self):
+        histogram = metrics.Histogram((1, 2, 3, float('inf')))
+        for value in (0.5,) * 50 + (1.5,) * 45 + (2.5,) * 4 + (10,):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.quantile(0.5), 1)
+        self.assertAlmostEqual(histogram.quantile(0.95), 2)
+        self.assertAlmostEqual(histogram.quantile(0.99), 3)
+        self.assertIsNone(metrics.Histogram((1,)).quantile(0.5))
+
+
+class MetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        cls.admin = User.objects.create(username='Admin', is_staff=True)
+        Post.objects.create(author=cls.user, text='Test')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def row(self, view):
+        rows = {row['view']: row for row in metrics.snapshot()}
+        return rows[view]
+
+    def test_requests_are_measured(self):
+        self.client.get('/')
+        self.client.get('/')
+        row = self.row('posts:index')
+        self.assertEqual(row['requests'], 2)
+        self.assertGreater(row['db_queries'][0], 0)
+        self.assertGreater(row['template_duration_seconds'][0], 0)
+        self.assertGreater(row['cache_hits'], 0)
+        self.assertGreater(row['cache_misses'], 0)
+
+    def test_unknown_urls_are_one_view(self):
+        self.client.get('/no-such-page/')
+        self.assertEqual(self.row('unresolved')['requests'], 1)
+
+    def test_report_is_for_staff_only(self):
+        response = self.client.get('/admin/metrics/')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.user)
+        response = self.client.get('/admin/metrics/')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/metrics/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTemplateUsed(response, 'core/metrics.html')
+
+    def test_prometheus_format(self):
+        self.client.get('/')
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/metrics/?format=prometheus')
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            text,
+        )
+        self.assertIn('le="+Inf"', text)
+        self.assertIn(
+            'yatube_template_render_seconds_count'
+            '{template="posts/index.html"} 1',
+            text,
+        )
+
+    def test_templates_are_measured(self):
+        """Every template, included ones too, gets a row of its own."""
+        self.client.get('/')
+        rows = {row['template']: row for row in metrics.template_snapshot()}
+        for name in ('posts/index.html', 'includes/header.html',
+                     'posts/includes/paginator.html'):
+            with self.subTest(name=name):
+                self.assertEqual(rows[name]['requests'], 1)
+                self.assertGreater(rows[name]['seconds'], 0)
+        self.assertLessEqual(
+            rows['includes/header.html']['seconds'],
+            rows['posts/index.html']['seconds'],
+        )
+
+    @override_settings(TEMPLATES=PRODUCTION_TEMPLATES)
+    def test_inlined_templates_are_measured(self):
+        response = self.client.get('/')
+        self.assertContains(response, 'Последние обновления на сайте')
+        names = {row['template'] for row in metrics.template_snapshot()}
+        self.assertIn('includes/header.html', names)
+        self.assertIn('posts/includes/paginator.html', names)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def serve(self, request, write=False):
+        """Run a request through the middleware, return read alias."""
+        used = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            used.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        response = replicas.ReplicaPinMiddleware(view)(request)
+        return used[0], response
+
+    def test_reads_go_to_replicas(self):
+        alias, response = self.serve(self.factory.get('/'))
+        self.assertEqual(alias, 'replica')
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_writes_pin_client_to_default(self):
+        alias, response = self.serve(self.factory.get('/'), write=True)
+        self.assertEqual(alias, 'default')
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+
+        request = self.factory.get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = '1'
+        alias, _ = self.serve(request)
+        self.assertEqual(alias, 'default')
+        alias, _ = self.serve(self.factory.get('/'))
+        self.assertEqual(alias, 'replica')
+
+    def test_unsafe_methods_read_default(self):
+        alias, _ = self.serve(self.factory.post('/'))
+        self.assertEqual(alias, 'default')
+
+    def test_related_objects_read_their_database(self):
+        post = Post()
+        post._state.db = 'default'
+        self.assertEqual(
+            self.router.db_for_read(User, instance=post), 'default'
+        )
+
+    def test_replicate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'source.sqlite3')
+            target = os.path.join(directory, 'target.sqlite3')
+            with sqlite3.connect(source) as db:
+                db.execute('CREATE TABLE t (x INTEGER)')
+                db.execute('INSERT INTO t VALUES (1)')
+            replicas.replicate(source, target)
+            db = sqlite3.connect(target)
+            self.assertEqual(db.execute('SELECT x FROM t').fetchall(), [(1,)])
+            db.close()
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    @override_settings(SQLITE_PRAGMAS={
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': 1234,
+    })
+    def test_new_connections_get_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = dict(
+                connection.settings_dict,
+                NAME=os.path.join(directory, 'tuned.sqlite3'),
+            )
+            database = DatabaseWrapper(settings_dict, alias='tuned')
+            try:
+                database.ensure_connection()
+                self.assertEqual(sqlite.pragmas(database), {
+                    'journal_mode': 'wal',
+                    'synchronous': 1,
+                    'busy_timeout': 1234,
+                })
+            finally:
+                database.close()
+
+
+def _increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_cache_api(self):
+        cache = self.cache
+        cache.set('a', {'x': 1})
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertFalse(cache.add('a', 2))
+        self.assertTrue(cache.add('b', 2))
+        self.assertEqual(cache.incr('b', 3), 5)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set_many({'c': 3, 'd': 4})
+        self.assertEqual(
+            cache.get_many(['a', 'c', 'd', 'missing']),
+            {'a': {'x': 1}, 'c': 3, 'd': 4},
+        )
+        cache.delete_many(['c', 'd'])
+        self.assertFalse(cache.has_key('c'))
+        self.assertTrue(cache.delete('a'))
+        self.assertIsNone(cache.get('a'))
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+
+    def test_expiry(self):
+        self.cache.set('gone', 1, 0)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.assertTrue(self.cache.touch('gone', None))
+        self.assertEqual(self.cache.get('gone'), 2)
+
+    def test_shared_between_instances(self):
+        """Every process opening the file sees the same entries."""
+        self.cache.set('shared', 'value')
+        self.assertEqual(SQLiteCache(self.path, {}).get('shared'), 'value')
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_increment, args=(self.path, 25))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 100)
+
+    def test_cull(self):
+        cache = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 5},
+        })
+        for i in range(100):
+            cache.set(f'key{i}', i)
+        count = cache.db.execute('SELECT count(*) FROM cache').fetchone()[0]
+        self.assertEqual(count, 8)
+        self.assertEqual(cache.get('key99'), 99)
+        self.assertIsNone(cache.get('key0'))
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': os.path.join(directory.name, 'cache.sqlite3'),
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def process(self, sync_interval=0, timeout=300):
+        """Two tier cache as another worker process would have it."""
+        return TwoTierCache('shared', {
+            'TIMEOUT': timeout,
+            'OPTIONS': {'SYNC_INTERVAL': sync_interval},
+        })
+
+    def test_local_tier_serves_reads(self):
+        cache = self.process(sync_interval=60)
+        cache.set('key', 'value')
+        cache.shared.delete('key')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get_many(['key']), {'key': 'value'})
+
+    def test_writes_invalidate_other_processes(self):
+        first, second = self.process(), self.process()
+        first.set('key', 1)
+        self.assertEqual(second.get('key'), 1)
+        first.incr('key')
+        self.assertEqual(second.get('key'), 2)
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+
+    def test_sets_keep_local_entries(self):
+        first, second = self.process(), self.process()
+        first.set('key', 1)
+        self.assertEqual(second.get('key'), 1)
+        first.set('key', 2)
+        first.add('other', 1)
+        self.assertIsNone(first.shared.get(TwoTierCache.GENERATION_KEY))
+        self.assertEqual(second.get('key'), 1)
+
+    def test_overwritten_values_are_seen_after_timeout(self):
+        first, second = self.process(), self.process(timeout=0.2)
+        first.set('key', 1)
+        self.assertEqual(second.get('key'), 1)
+        first.set('key', 2)
+        time.sleep(0.3)
+        self.assertEqual(second.get('key'), 2)
+
+    def test_other_processes_sync_within_interval(self):
+        first, second = self.process(), self.process(sync_interval=0.2)
+        first.set('key', 1)
+        self.assertEqual(second.get('key'), 1)
+        first.incr('key')
+        self.assertEqual(second.get('key'), 1)
+        time.sleep(0.3)
+        self.assertEqual(second.get('key'), 2)
+
+    def test_own_writes_are_seen_at_once(self):
+        cache = self.process(sync_interval=60)
+        cache.get('key')
+        cache.set('key', 1)
+        self.assertEqual(cache.get('key'), 1)
+        self.assertEqual(cache.incr('key'), 2)
+        self.assertEqual(cache.get('key'), 2)
+        cache.clear()
+        self.assertIsNone(cache.get('key'))
+
+    def test_single_flight_keeps_local_tiers(self):
+        cache = self.process()
+        singleflight.get_or_compute('key', lambda: 'value', 60, cache=cache)
+        singleflight.get_or_compute(
+            'key', lambda: 'value', 60, version=2, cache=cache
+        )
+        self.assertIsNone(cache.shared.get(TwoTierCache.GENERATION_KEY))
+
+    def test_lru(self):
+        cache = TwoTierCache('shared', {'OPTIONS': {
+            'MAX_ENTRIES': 2, 'SYNC_INTERVAL': 60,
+        }})
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.shared.delete_many(['a', 'b', 'c'])
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {
+            'b': 'b', 'c': 'c',
+        })
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='value', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_value_is_cached(self):
+        for _ in range(3):
+            value = singleflight.get_or_compute('key', self.compute(), 60)
+        self.assertEqual(value, 'value')
+        self.assertEqual(self.calls, 1)
+
+    def test_new_version_recomputes(self):
+        singleflight.get_or_compute('key', self.compute('old'), 60, version=1)
+        value = singleflight.get_or_compute(
+            'key', self.compute('new'), 60, version=2
+        )
+        self.assertEqual(value, 'new')
+
+    def test_stale_value_while_another_computes(self):
+        singleflight.get_or_compute('key', self.compute('old'), 60, 60, 1)
+        cache.add('key:lock', 1)
+        metrics._local.stats = stats = metrics.RequestStats()
+        try:
+            value = singleflight.get_or_compute(
+                'key', self.compute('new'), 60, 60, version=2
+            )
+        finally:
+            metrics._local.stats = None
+        self.assertEqual(value, 'old')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(stats.coalesced, 1)
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+
+        def worker():
+            results.append(singleflight.get_or_compute(
+                'key', self.compute(delay=0.2), 60
+            ))
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(self.calls, 1)
+
+    def test_expired_lock_is_taken_over_once(self):
+        """Waiters outliving the lock do not all compute at once."""
+        running, peak = [], []
+
+        def compute():
+            running.append(1)
+            peak.append(len(running))
+            time.sleep(0.5)
+            running.pop()
+            return 'value'
+
+        def worker():
+            singleflight.get_or_compute('key', compute, 60)
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        with mock.patch.object(singleflight, 'LOCK_TIMEOUT', 0.3):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertLessEqual(max(peak), 2)
+
+    def test_lock_of_another_caller_is_kept(self):
+        def compute():
+            # The lock expired and another caller took it meanwhile.
+            cache.set('key:lock', 'other')
+            return 'value'
+        singleflight.get_or_compute('key', compute, 60)
+        self.assertEqual(cache.get('key:lock'), 'other')
+
+    def test_failed_computation_releases_lock(self):
+        def fail():
+            raise RuntimeError
+        with self.assertRaises(RuntimeError):
+            singleflight.get_or_compute('key', fail, 60)
+        self.assertEqual(
+            singleflight.get_or_compute('key', self.compute(), 60), 'value'
+        )
+
+    def test_view_responses_to_guests(self):
+        @singleflight.coalesce_view(60)
+        def view(request):
+            self.calls += 1
+            status = 404 if request.GET.get('missing') else 200
+            return HttpResponse(str(self.calls), status=status)
+
+        factory = RequestFactory()
+        for _ in range(2):
+            request = factory.get('/')
+            request.user = AnonymousUser()
+            self.assertEqual(view(request).content, b'1')
+
+        request = factory.get('/')
+        request.user = User(username='user')
+        self.assertEqual(view(request).content, b'2')
+        for _ in range(2):
+            request = factory.get('/?missing=1')
+            request.user = AnonymousUser()
+            self.assertEqual(view(request).status_code, 404)
+        self.assertEqual(self.calls, 4)
+
+
+class TemplateLoaderTests(SimpleTestCase):
+    templates = {
+        'page.html': (
+            "{% include 'small.html' %}|"
+            "{% include 'small.html' with who='you' %}|"
+            "{% with who='me' %}{% include 'small.html' only %}{% endwith %}|"
+            "{% include name %}|"
+            "{% include 'large.html' %}|"
+            "{% include 'blocks.html' %}"
+        ),
+        'small.html': "{{ who|default:'nobody' }}",
+        'large.html': 'x' * 100,
+        'blocks.html': '{% block title %}title{% endblock %}',
+        'tree.html': (
+            '{{ depth }}{% if depth %}'
+            "{% include 'tree.html' with depth=depth|add:-1 %}{% endif %}"
+        ),
+    }
+
+    def engine(self, loader):
+        return Engine(
+            loaders=[(loader, [
+                ('django.template.loaders.locmem.Loader', self.templates),
+            ])],
+        )
+
+    def render(self, loader, template_name, **context):
+        template = self.engine(loader).get_template(template_name)
+        return template, template.render(Context(context))
+
+    @override_settings(TEMPLATE_INLINE_MAX_SIZE=50)
+    def test_small_static_includes_are_inlined(self):
+        template, inlined = self.render(
+            'core.loaders.Loader', 'page.html', name='small.html', who='all'
+        )
+        _, included = self.render(
+            'django.template.loaders.cached.Loader', 'page.html',
+            name='small.html', who='all',
+        )
+        self.assertEqual(inlined, included)
+        self.assertEqual(inlined, 'all|you|nobody|all|' + 'x' * 100 + '|title')
+        nodes = template.nodelist
+        self.assertEqual(
+            len(nodes.get_nodes_by_type(loaders.InlinedIncludeNode)), 3
+        )
+        # The dynamic, the large and the one with blocks stay includes.
+        self.assertEqual(len(nodes.get_nodes_by_type(IncludeNode)), 3)
+
+    def test_recursive_includes_stay_includes(self):
+        _, inlined = self.render('core.loaders.Loader', 'tree.html', depth=3)
+        self.assertEqual(inlined, '3210')
+
+    def test_templates_are_parsed_once(self):
+        engine = self.engine('core.loaders.Loader')
+        self.assertIs(
+            engine.get_template('page.html'), engine.get_template('page.html')
+        )
+
+    def test_warm(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, 'sub'))
+            files = {
+                'a.html': 'a',
+                os.path.join('sub', 'b.html'): "{% include 'a.html' %}",
+                'broken.html': '{% no_such_tag %}',
+            }
+            for name, content in files.items():
+                with open(os.path.join(directory, name), 'w') as file:
+                    file.write(content)
+            engine = Engine(dirs=[directory], loaders=[
+                ('core.loaders.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                ]),
+            ])
+            self.assertEqual(loaders.warm(engine), ['a.html', 'sub/b.html'])
+            cached = engine.template_loaders[0].get_template_cache
+            self.assertEqual(len(cached), 2)
+
+
+class HoleTests(SimpleTestCase):
+    def request(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return request
+
+    def test_fill(self):
+        hole = holes.placeholder(
+            'posts/includes/edit_link.html', {'post_id': 1, 'author_id': 2}
+        )
+        content = f'<p>{hole}</p><p>{hole}</p>'
+        author = User(pk=2, username='author')
+        filled = holes.fill(content, self.request(author))
+        self.assertEqual(filled.count('/posts/1/edit/'), 2)
+        self.assertNotIn('<!--hole:', filled)
+        filled = holes.fill(content, self.request(AnonymousUser()))
+        self.assertNotIn('/posts/1/edit/', filled)
+        self.assertNotIn('<!--hole:', filled)
+
+    def test_forged_holes_are_dropped(self):
+        hole = holes.placeholder('includes/footer.html', {})
+        name, signature = hole[len('<!--hole:'):-len('-->')].split(':')
+        forged = f'<!--hole:{name}:{signature[::-1]}-->'
+        self.assertEqual(
+            holes.fill(forged, self.request(AnonymousUser())), ''
+        )
+
+    def test_middleware_fills_html_only(self):
+        hole = holes.placeholder(
+            'posts/includes/edit_link.html', {'post_id': 1, 'author_id': 2}
+        )
+        request = self.request(User(pk=2, username='author'))
+        for content_type, filled in (('text/html', True),
+                                     ('application/json', False)):
+            with self.subTest(content_type=content_type):
+                middleware = holes.HoleMiddleware(
+                    lambda request: HttpResponse(
+                        hole, content_type=content_type
+                    )
+                )
+                response = middleware(request)
+                self.assertEqual(
+                    b'/posts/1/edit/' in response.content, filled
+                )
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.storage = ContentAddressedStorage(location=self.directory.name)
+
+    def test_identical_files_are_stored_once(self):
+        first = self.storage.save('posts/a.JPG', ContentFile(b'image'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        other = self.storage.save('posts/a.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/([0-9a-f]{2})/\1[0-9a-f]{62}\.jpg$')
+        self.assertEqual(self.storage.open(first).read(), b'image')
+        _, files = self.storage.listdir(os.path.dirname(first))
+        self.assertEqual(files, [os.path.basename(first)])
+
+    def test_hashed_media_is_cached_for_good(self):
+        hashed = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        plain = FileSystemStorage(self.directory.name).save(
+            'posts/a.jpg', ContentFile(b'image')
+        )
+        request = RequestFactory().get('/')
+        with self.settings(MEDIA_ROOT=self.directory.name):
+            response = views.media(request, hashed)
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('public', response['Cache-Control'])
+            response = views.media(request, plain)
+            self.assertFalse(response.has_header('Cache-Control'))
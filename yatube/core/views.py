@@ -1,4 +1,12 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+from . import metrics
+from .storage import IMMUTABLE_NAME
 
 
 def page_not_found(request, exception):
@@ -15,3 +23,29 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def metrics_report(request):
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(
+            metrics.prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+    context = {
+        'quantiles': metrics.QUANTILES,
+        'rows': metrics.snapshot(),
+        'templates': metrics.template_snapshot(),
+    }
+    return render(request, 'core/metrics.html', context)
+
+
+def media(request, path):
+    """Serve MEDIA_ROOT, files named by their content cached for good."""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if IMMUTABLE_NAME.search(path):
+        patch_cache_control(
+            response, public=True, immutable=True,
+            max_age=settings.MEDIA_IMMUTABLE_MAX_AGE,
+        )
+    return response
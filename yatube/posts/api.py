@@ -0,0 +1,161 @@
+"""Read only JSON API, version 1.
+
+Lists are serialized from values() rows of the querysets the pages use,
+no model instances are built, and paginated by the same keyset cursors.
+Responses carry an ETag derived from the newest date of their list and
+the fragments version, so conditional requests of clients and proxies are
+answered with 304 Not Modified after one indexed query, see
+posts.conditional.
+"""
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+from django.views.decorators.vary import vary_on_cookie
+
+from .conditional import conditional, newest
+from .feed import feed_posts
+from .models import Comment, Group, Post, User
+from .utils import CursorPaginator
+from .views import COMMENTS_ON_PAGE, POSTS_ON_PAGE
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author__username', 'group__slug', 'image',
+    'comments_count',
+)
+COMMENT_FIELDS = ('id', 'post_id', 'author__username', 'text', 'created')
+
+
+def image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field('image').storage.url(name)
+
+
+def login_required_json(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Authentication required.'}, status=401
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def exists_or_404(lookup):
+    """404 unless lookup(**kwargs) finds a row, before any validator.
+
+    Lists of a missing group or author would be empty, not missing, and
+    their ETag could answer 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not lookup(**kwargs).exists():
+                raise Http404
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def post_row(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': image_url(row['image']),
+        'comments_count': row['comments_count'],
+    }
+
+
+def comment_row(row):
+    return {
+        'id': row['id'],
+        'post': row['post_id'],
+        'author': row['author__username'],
+        'text': row['text'],
+        'created': row['created'],
+    }
+
+
+def page_response(request, queryset, per_page, field, serialize,
+                  tiebreak='pk'):
+    paginator = CursorPaginator(queryset, per_page, field, tiebreak)
+    page = paginator.get_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
+    return JsonResponse({
+        'results': [serialize(row) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def post_page(request, posts):
+    return page_response(
+        request, posts.values(*POST_FIELDS), POSTS_ON_PAGE, 'pub_date',
+        post_row,
+    )
+
+
+@require_safe
+@conditional(lambda request: newest(Post.objects, 'pub_date'))
+def index(request):
+    return post_page(request, Post.objects.all())
+
+
+@require_safe
+@exists_or_404(lambda slug: Group.objects.filter(slug=slug))
+@conditional(lambda request, slug: newest(
+    Post.objects.filter(group__slug=slug), 'pub_date'
+))
+def group_posts(request, slug):
+    return post_page(request, Post.objects.filter(group__slug=slug))
+
+
+@require_safe
+@exists_or_404(lambda username: User.objects.filter(username=username))
+@conditional(lambda request, username: newest(
+    Post.objects.filter(author__username=username), 'pub_date'
+))
+def profile(request, username):
+    return post_page(
+        request, Post.objects.filter(author__username=username)
+    )
+
+
+@require_safe
+@conditional(lambda request, post_id: newest(
+    Post.objects.filter(pk=post_id), 'pub_date'
+))
+def post_detail(request, post_id):
+    row = get_object_or_404(Post.objects.values(*POST_FIELDS), pk=post_id)
+    return JsonResponse(post_row(row))
+
+
+@require_safe
+@exists_or_404(lambda post_id: Post.objects.filter(pk=post_id))
+@conditional(lambda request, post_id: newest(
+    Comment.objects.filter(post_id=post_id), 'created'
+))
+def post_comments(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id)
+    return page_response(
+        request, comments.values(*COMMENT_FIELDS), COMMENTS_ON_PAGE,
+        'created', comment_row,
+    )
+
+
+@require_safe
+@login_required_json
+@vary_on_cookie
+@conditional(lambda request: newest(feed_posts(request.user), 'feed_date'))
+def follow_index(request):
+    posts = feed_posts(request.user).values('feed_date', *POST_FIELDS)
+    return page_response(
+        request, posts, POSTS_ON_PAGE, 'feed_date', post_row, 'feed_post'
+    )
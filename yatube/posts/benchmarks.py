@@ -0,0 +1,94 @@
+"""Scripted requests shared by the benchmark commands."""
+import math
+import random
+
+from django.core.management.base import CommandError
+from django.test import Client
+from django.urls import reverse
+
+from core.replicas import PIN_COOKIE
+
+from .models import Follow, Group, Post, User
+
+BENCHMARK_USER = 'benchmark'
+SAMPLE_SIZE = 500
+
+
+def percentile(samples, q):
+    """Nearest rank percentile of sorted samples."""
+    if not samples:
+        return None
+    return samples[max(0, math.ceil(q * len(samples)) - 1)]
+
+
+class Targets:
+    """Random existing objects for scenarios to request."""
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        self.post_ids = self.sample(Post, 'pk')
+        self.slugs = self.sample(Group, 'slug')
+        self.usernames = self.sample(User, 'username')
+        if not self.post_ids or not self.slugs:
+            raise CommandError(
+                'Nothing to request, fill the database with seed_data.'
+            )
+        self.user, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+        for username in self.usernames[:20]:
+            author = User.objects.get(username=username)
+            if author != self.user:
+                Follow.objects.get_or_create(user=self.user, author=author)
+
+    def sample(self, model, field):
+        """Values of up to SAMPLE_SIZE rows at random pk ranges."""
+        bounds = model.objects.order_by('pk').values_list('pk', flat=True)
+        first, last = bounds.first(), bounds.last()
+        if first is None:
+            return []
+        values = []
+        for _ in range(SAMPLE_SIZE // 50):
+            start = self.random.randint(first, last)
+            values.extend(model.objects.filter(pk__gte=start).order_by(
+                'pk'
+            ).values_list(field, flat=True)[:50])
+        return list(dict.fromkeys(values))
+
+    def choice(self, values):
+        return self.random.choice(values)
+
+
+SCENARIOS = {
+    'index': (False, lambda t: ('get', reverse('posts:index'), None)),
+    'group': (False, lambda t: (
+        'get', reverse('posts:group_list', args=(t.choice(t.slugs),)), None
+    )),
+    'profile': (False, lambda t: (
+        'get', reverse('posts:profile', args=(t.choice(t.usernames),)), None
+    )),
+    'detail': (False, lambda t: (
+        'get', reverse('posts:post_detail', args=(t.choice(t.post_ids),)),
+        None,
+    )),
+    'follow': (True, lambda t: ('get', reverse('posts:follow_index'), None)),
+    'post_create': (True, lambda t: (
+        'post', reverse('posts:post_create'), {'text': 'Benchmark post'}
+    )),
+    'comment_create': (True, lambda t: (
+        'post',
+        reverse('posts:add_comment', args=(t.choice(t.post_ids),)),
+        {'text': 'Benchmark comment'},
+    )),
+}
+
+
+def scenario_client(name, targets):
+    """Test client ready to run a scenario, and the scenario itself."""
+    login, scenario = SCENARIOS[name]
+    # Not one of INTERNAL_IPS, so debug_toolbar stays out of the way.
+    client = Client(REMOTE_ADDR='192.0.2.1')
+    if login:
+        client.force_login(targets.user)
+        # Its session is not on replicas yet, a real login pins the
+        # client to default the same way.
+        client.cookies[PIN_COOKIE] = '1'
+    return client, scenario
@@ -0,0 +1,51 @@
+"""Versioned fragment cache for post lists.
+
+Fragments embed the current version in their keys; any change to posts,
+comments, groups or follows bumps it, so stale fragments are never read
+again and simply expire. Requests reading replicas get a version of
+their own: what they render may miss the writes of pinned clients, who
+must not read it. Replicas catching up bump the version too.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.replicas import reads_replica
+
+VERSION_KEY = 'posts:fragments:version'
+
+
+def _seed():
+    # Time based seed, so a version lost to eviction or cache.clear()
+    # never comes back to a value old fragments were stored under.
+    return int(time.time() * 1000)
+
+
+def fragments_version():
+    """Current version of post list fragments."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _seed(), None)
+        version = cache.get(VERSION_KEY, _seed())
+    if reads_replica():
+        return f'{version}:replica'
+    return version
+
+
+def bump_fragments_version():
+    """Invalidate every cached post list fragment."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Deleted rather than set, so two tier caches drop their local
+        # copies too; the next read seeds a new version.
+        cache.delete(VERSION_KEY)
+
+
+def fragment_context():
+    """Template context the post list fragments are keyed by."""
+    return {
+        'fragments_version': fragments_version(),
+        'fragments_timeout': settings.POSTS_FRAGMENTS_TIMEOUT,
+    }
@@ -0,0 +1,84 @@
+"""Conditional GET and Cache-Control for posts pages and the API.
+
+ETags come from the newest date of what a response shows and the
+fragments version, which every write to posts, comments, groups and
+follows bumps. Checking them costs one indexed query, after which an
+unchanged page is answered with 304 Not Modified without rendering.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .cache import fragments_version
+
+
+def newest(queryset, field):
+    """Latest value of a date field in queryset, None if it is empty."""
+    return queryset.order_by('-' + field).values_list(
+        field, flat=True
+    ).first()
+
+
+def conditional(latest, per_user=False):
+    """Answer conditional GETs by an ETag of latest(request, *args, **kwargs).
+
+    The ETag also covers the fragments version, edits and deletions bump
+    it without touching any date. There is no Last-Modified: the newest
+    date alone stays put on edits, deletions and renames. With per_user
+    pages of authenticated users get an ETag of their own, bound to the
+    CSRF cookie their forms carry.
+    """
+    def etag(request, *args, **kwargs):
+        date = latest(request, *args, **kwargs)
+        parts = [date and date.isoformat(), fragments_version()]
+        if per_user and request.user.is_authenticated:
+            parts += [
+                request.user.pk,
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+            ]
+        raw = '|'.join(str(part) for part in parts)
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    return condition(etag_func=etag)
+
+
+def cache_policy(latest):
+    """Validators by latest, public caching for guests, private for users.
+
+    Guests share pages, so proxies may keep them for
+    settings.POSTS_PUBLIC_MAX_AGE. Pages of users stay in their browser
+    only, for settings.POSTS_PRIVATE_MAX_AGE. Stale pages served while
+    another request recomputes them, see core.singleflight, carry no
+    ETag and must be revalidated before any reuse.
+    """
+    def decorator(view):
+        view = conditional(latest, per_user=True)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            if request.user.is_authenticated:
+                patch_cache_control(
+                    response, private=True,
+                    max_age=settings.POSTS_PRIVATE_MAX_AGE,
+                )
+            else:
+                patch_cache_control(
+                    response, public=True,
+                    max_age=settings.POSTS_PUBLIC_MAX_AGE,
+                )
+            if getattr(response, 'stale', False):
+                # The ETag describes the current version, not this body,
+                # a 304 by it would keep it forever.
+                del response['ETag']
+                patch_cache_control(response, no_cache=True, max_age=0)
+            # The same url is a different page once logged in.
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,267 @@
+"""Denormalized counters.
+
+Post.comments_count, UserStats, GroupStats and GroupAuthorStats rows are
+updated with single F() expressions on every create, edit and delete, so
+they stay correct under concurrent writes. Rows written past the signals,
+by bulk_create or raw SQL, may leave a counter behind; it then stops at
+zero instead of failing the delete. The rebuild_*() functions and check()
+recompute them from scratch.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest
+
+from .models import (Comment, Follow, Group, GroupAuthorStats, GroupStats,
+                     Post, User, UserStats)
+
+BATCH_SIZE = 500
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author_id'),
+    'followers_count': (Follow, 'author_id'),
+    'following_count': (Follow, 'user_id'),
+}
+
+
+def shifted(name, delta):
+    """Counter name moved by delta, never below zero."""
+    return Greatest(F(name) + delta, 0)
+
+
+def change_user(user_id, **deltas):
+    """Shift counters of one user by the given deltas."""
+    UserStats.objects.filter(user_id=user_id).update(
+        **{name: shifted(name, delta) for name, delta in deltas.items()}
+    )
+
+
+def change_post(post_id, delta):
+    """Shift comments counter of one post."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=shifted('comments_count', delta)
+    )
+
+
+def add_group_post(group_id, author_id, pub_date):
+    """Count a post into its group."""
+    stats = GroupStats.objects.filter(group_id=group_id)
+    stats.update(posts_count=shifted('posts_count', 1))
+    stats.filter(
+        Q(last_post_date__isnull=True) | Q(last_post_date__lt=pub_date)
+    ).update(last_post_date=pub_date)
+    change_group_author(group_id, author_id, 1)
+
+
+def remove_group_post(group_id, author_id, pub_date):
+    """Count a post out of its group, once it is not in it any more."""
+    stats = GroupStats.objects.filter(group_id=group_id)
+    stats.update(posts_count=shifted('posts_count', -1))
+    # Only removing the newest post changes the last activity.
+    stats.filter(last_post_date__lte=pub_date).update(
+        last_post_date=Subquery(
+            Post.objects.filter(
+                group_id=OuterRef('group_id')
+            ).order_by('-pub_date').values('pub_date')[:1]
+        )
+    )
+    change_group_author(group_id, author_id, -1)
+
+
+def change_group_author(group_id, author_id, delta):
+    """Shift posts counter of an author in a group, adding the row."""
+    rows = GroupAuthorStats.objects.filter(
+        group_id=group_id, author_id=author_id
+    )
+    if rows.update(posts_count=shifted('posts_count', delta)) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            GroupAuthorStats.objects.create(
+                group_id=group_id, author_id=author_id, posts_count=delta
+            )
+    except IntegrityError:
+        # Created by a concurrent request in the meantime.
+        rows.update(posts_count=shifted('posts_count', delta))
+
+
+def top_authors(group_ids, limit=3):
+    """Most prolific authors of every group, in one query."""
+    best = GroupAuthorStats.objects.filter(
+        group_id=OuterRef('group_id'), posts_count__gt=0
+    ).order_by('-posts_count', '-pk').values('pk')[:limit]
+    rows = GroupAuthorStats.objects.filter(
+        group_id__in=group_ids, pk__in=Subquery(best)
+    ).select_related('author').order_by('group_id', '-posts_count', '-pk')
+    authors = {group_id: [] for group_id in group_ids}
+    for row in rows:
+        authors[row.group_id].append(row)
+    return authors
+
+
+def user_stats(user):
+    """Counters of user, rebuilt on the spot if the row is missing."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild_users(User.objects.filter(pk=user.pk))
+        return UserStats.objects.get(user=user)
+
+
+def group_stats(group):
+    """Figures of group, rebuilt on the spot if the row is missing."""
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        rebuild_groups(Group.objects.filter(pk=group.pk))
+        return GroupStats.objects.get(group=group)
+
+
+def _actual_user_counters(users):
+    actual = {}
+    for name, (model, field) in USER_COUNTERS.items():
+        counts = model.objects.filter(
+            **{f'{field}__in': users.values('pk')}
+        ).order_by().values_list(field).annotate(Count('pk'))
+        for user_id, count in counts:
+            actual.setdefault(user_id, {})[name] = count
+    return actual
+
+
+def _actual_post_counters(posts):
+    return dict(
+        Comment.objects.filter(
+            post__in=posts.values('pk')
+        ).order_by().values_list('post_id').annotate(Count('pk'))
+    )
+
+
+def _actual_group_counters(groups):
+    posts = Post.objects.filter(group__in=groups.values('pk')).order_by()
+    totals = {
+        group_id: {'posts_count': count, 'last_post_date': last}
+        for group_id, count, last in posts.values_list('group_id').annotate(
+            Count('pk'), Max('pub_date')
+        )
+    }
+    authors = {
+        (group_id, author_id): count
+        for group_id, author_id, count in posts.values_list(
+            'group_id', 'author_id'
+        ).annotate(Count('pk'))
+    }
+    return totals, authors
+
+
+@transaction.atomic
+def rebuild_users(users):
+    """Recompute UserStats of users, keeping their feed mode."""
+    actual = _actual_user_counters(users)
+    stats = UserStats.objects.filter(user__in=users.values('pk'))
+    merged = set(
+        stats.filter(feed_merged=True).values_list('user_id', flat=True)
+    )
+    stats.delete()
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=user_id, feed_merged=user_id in merged, **{
+                name: actual.get(user_id, {}).get(name, 0)
+                for name in USER_COUNTERS
+            })
+            for user_id in users.values_list('pk', flat=True).iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+@transaction.atomic
+def rebuild_posts(posts):
+    """Recompute Post.comments_count of posts."""
+    actual = _actual_post_counters(posts)
+    posts.update(comments_count=0)
+    for post_id, count in actual.items():
+        Post.objects.filter(pk=post_id).update(comments_count=count)
+
+
+@transaction.atomic
+def rebuild_groups(groups):
+    """Recompute GroupStats and GroupAuthorStats of groups."""
+    totals, authors = _actual_group_counters(groups)
+    GroupStats.objects.filter(group__in=groups.values('pk')).delete()
+    GroupAuthorStats.objects.filter(group__in=groups.values('pk')).delete()
+    empty = {'posts_count': 0, 'last_post_date': None}
+    GroupStats.objects.bulk_create(
+        (
+            GroupStats(group_id=group_id, **totals.get(group_id, empty))
+            for group_id in groups.values_list('pk', flat=True).iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    GroupAuthorStats.objects.bulk_create(
+        (
+            GroupAuthorStats(
+                group_id=group_id, author_id=author_id, posts_count=count
+            )
+            for (group_id, author_id), count in authors.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def check(users, posts, groups=None):
+    """Yield (object, counter, stored, actual) for every wrong counter.
+
+    Stored value is None when the user or group has no stats row at all.
+    """
+    actual = _actual_user_counters(users)
+    stored = {
+        stats['user_id']: stats
+        for stats in UserStats.objects.filter(
+            user__in=users.values('pk')
+        ).values()
+    }
+    for user in users.iterator():
+        for name in USER_COUNTERS:
+            value = stored.get(user.pk, {}).get(name)
+            expected = actual.get(user.pk, {}).get(name, 0)
+            if value != expected:
+                yield user, name, value, expected
+
+    actual = _actual_post_counters(posts)
+    for post in posts.only('pk', 'comments_count').iterator():
+        expected = actual.get(post.pk, 0)
+        if post.comments_count != expected:
+            yield post, 'comments_count', post.comments_count, expected
+
+    if groups is not None:
+        yield from _check_groups(groups)
+
+
+def _check_groups(groups):
+    totals, authors = _actual_group_counters(groups)
+    stored = {
+        stats['group_id']: stats
+        for stats in GroupStats.objects.filter(
+            group__in=groups.values('pk')
+        ).values()
+    }
+    for group in groups.iterator():
+        for name in ('posts_count', 'last_post_date'):
+            value = stored.get(group.pk, {}).get(name)
+            expected = totals.get(group.pk, {}).get(
+                name, 0 if name == 'posts_count' else None
+            )
+            if value != expected:
+                yield group, name, value, expected
+
+    rows = GroupAuthorStats.objects.filter(
+        group__in=groups.values('pk'), posts_count__gt=0
+    )
+    stored_authors = {}
+    for row in rows.iterator():
+        stored_authors[row.group_id, row.author_id] = row
+    for key in set(stored_authors) | set(authors):
+        value = getattr(stored_authors.get(key), 'posts_count', None)
+        expected = authors.get(key)
+        if value != expected:
+            group = Group.objects.get(pk=key[0])
+            yield group, f'posts_count of author {key[1]}', value, expected
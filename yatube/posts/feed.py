@@ -0,0 +1,184 @@
+"""Materialized follow feed.
+
+Posts are copied into FeedEntry rows of every follower when they are
+written, so reading /follow/ is one indexed range read. Authors who get
+more than settings.FEED_FANOUT_LIMIT followers are marked feed_merged and
+no longer fanned out, their posts are merged into the feed on read
+instead. Only fan_out_author(), run by the fan_out_feeds command, copies
+them back once they are settings.FEED_FANOUT_HYSTERESIS followers under
+the limit, so follows and unfollows around it cost no copying at all.
+"""
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    """True when author's posts are merged on read, not fanned out."""
+    return UserStats.objects.filter(
+        user_id=author_id, feed_merged=True
+    ).exists()
+
+
+def merge_if_over_limit(author_id):
+    """Stop fanning author out once over settings.FEED_FANOUT_LIMIT."""
+    UserStats.objects.filter(
+        user_id=author_id,
+        feed_merged=False,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).update(feed_merged=True)
+
+
+def back_under_limit():
+    """Authors fan_out_author() should copy into feeds again."""
+    return UserStats.objects.filter(
+        feed_merged=True,
+        followers_count__lte=(
+            settings.FEED_FANOUT_LIMIT - settings.FEED_FANOUT_HYSTERESIS
+        ),
+    ).values_list('user_id', flat=True)
+
+
+def fan_out_post(post):
+    """Copy a new post into feeds of its author's followers."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author(user_id, author_id):
+    """Backfill user's feed with everything author has posted."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_author(author_id):
+    """Copy posts of a merged author into feeds, then stop merging.
+
+    Followers are copied in batches, in transactions of their own. Posts
+    and follows made during the copy are neither fanned out nor copied,
+    they are caught up with in the transaction that ends merging.
+    """
+    last_post = Post.objects.filter(
+        author_id=author_id
+    ).aggregate(last=Max('pk'))['last'] or 0
+    last_follow = Follow.objects.filter(
+        author_id=author_id
+    ).aggregate(last=Max('pk'))['last'] or 0
+    posts = Post.objects.filter(author_id=author_id)
+    follows = Follow.objects.filter(author_id=author_id)
+    _copy(follows.filter(pk__lte=last_follow), posts.filter(pk__lte=last_post))
+    with transaction.atomic():
+        UserStats.objects.filter(user_id=author_id).update(feed_merged=False)
+        _copy(follows, posts.filter(pk__gt=last_post))
+        _copy(follows.filter(pk__gt=last_follow), posts)
+
+
+def _copy(follows, posts):
+    """Put posts into the feeds of follows, a batch at a time."""
+    users = follows.values_list('user_id', flat=True).iterator()
+    posts = posts.values_list('id', 'pub_date')
+    for chunk in _batches(users):
+        entries = (
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+            for user_id in chunk
+        )
+        for batch in _batches(entries):
+            with transaction.atomic():
+                FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _batches(iterable):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, BATCH_SIZE))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, BATCH_SIZE))
+
+
+def remove_author(user_id, author_id):
+    """Drop author's posts from user's feed."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild():
+    """Recreate every materialized feed from Follow rows."""
+    UserStats.objects.update(feed_merged=False)
+    UserStats.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(feed_merged=True)
+    followers = defaultdict(list)
+    follows = Follow.objects.exclude(
+        author__stats__feed_merged=True
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        followers[author_id].append(user_id)
+
+    FeedEntry.objects.all().delete()
+    batch = []
+    posts = Post.objects.values_list('id', 'author_id', 'pub_date')
+    for post_id, author_id, pub_date in posts.iterator():
+        for user_id in followers.get(author_id, ()):
+            batch.append(FeedEntry(
+                user_id=user_id, post_id=post_id, pub_date=pub_date
+            ))
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch)
+            batch = []
+    FeedEntry.objects.bulk_create(batch)
+
+
+def feed_posts(user):
+    """Posts of the authors user follows, newest first.
+
+    Ordered by (feed_date, feed_post), columns of the feed index when
+    the feed is materialized, so its pages need no sorting.
+    """
+    celebrities = list(Follow.objects.filter(
+        user=user, author__stats__feed_merged=True
+    ).values_list('author_id', flat=True))
+    if not celebrities:
+        posts = Post.objects.filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post'),
+        )
+    else:
+        materialized = FeedEntry.objects.filter(
+            user=user
+        ).values('post_id')
+        posts = Post.objects.filter(
+            Q(id__in=materialized) | Q(author_id__in=celebrities)
+        ).annotate(feed_date=F('pub_date'), feed_post=F('pk'))
+    return posts.order_by('-feed_date', '-feed_post')
@@ -1,5 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -8,6 +12,30 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Uploads over the limit were dropped while streaming in, there is
+        # no image left to validate.
+        self.oversized_image = None
+        if uploads.is_oversized(self.files.get('image')):
+            self.files = self.files.copy()
+            self.oversized_image = self.files.pop('image')[0]
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image = uploads.normalize(image)
+        return image
+
+    def clean(self):
+        if self.oversized_image is not None:
+            self.add_error('image', forms.ValidationError(
+                'Файл больше %(limit)s.',
+                code='file_too_large',
+                params={'limit': filesizeformat(settings.UPLOAD_MAX_BYTES)},
+            ))
+        return super().clean()
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,166 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import repeat
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts.benchmarks import SCENARIOS, Targets, percentile, scenario_client
+
+
+class Command(BaseCommand):
+    help = (
+        'Run scripted requests against posts views in process and report '
+        'throughput and latency percentiles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenarios', default=','.join(SCENARIOS),
+            help='Comma separated, any of: ' + ', '.join(SCENARIOS),
+        )
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear the cache before every request.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--save', metavar='FILE',
+                            help='Store results as a JSON baseline.')
+        parser.add_argument('--compare', metavar='FILE',
+                            help='Fail when slower than this baseline.')
+        parser.add_argument(
+            '--tolerance', type=float, default=10,
+            help='Allowed regression of p95 and throughput, in percent.',
+        )
+
+    def handle(self, *args, **options):
+        names = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(unknown)}')
+        self.options = options
+        targets = Targets(options['seed'])
+
+        results = {}
+        for name in names:
+            results[name] = self.run(name, targets)
+            self.report(name, results[name])
+
+        if options['save']:
+            with open(options['save'], 'w') as baseline:
+                json.dump(results, baseline, indent=2, sort_keys=True)
+            self.stdout.write(f'Baseline saved to {options["save"]}')
+        if options['compare']:
+            self.compare(results, options['compare'])
+
+    def request(self, client, scenario, targets):
+        """Make one request, return its latency and number of queries."""
+        method, url, data = scenario(targets)
+        if self.options['cold']:
+            cache.clear()
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = getattr(client, method)(url, data)
+        elapsed = time.perf_counter() - start
+        expected = 200 if method == 'get' else 302
+        if response.status_code != expected:
+            raise CommandError(f'{method.upper()} {url}: '
+                               f'{response.status_code}')
+        return elapsed, len(queries)
+
+    def worker(self, name, targets, count, own_connection=False):
+        client, scenario = scenario_client(name, targets)
+        try:
+            return [
+                self.request(client, scenario, targets)
+                for _ in range(count)
+            ]
+        finally:
+            # Threads of the pool open connections of their own.
+            if own_connection:
+                connections.close_all()
+
+    def run(self, name, targets):
+        concurrency = max(1, self.options['concurrency'])
+        if self.options['warmup']:
+            self.worker(name, targets, self.options['warmup'])
+        share, extra = divmod(self.options['requests'], concurrency)
+        counts = [share + (i < extra) for i in range(concurrency)]
+
+        start = time.perf_counter()
+        if concurrency == 1:
+            samples = self.worker(name, targets, counts[0])
+        else:
+            with ThreadPoolExecutor(concurrency) as pool:
+                samples = [
+                    sample
+                    for chunk in pool.map(
+                        self.worker, repeat(name), repeat(targets), counts,
+                        repeat(True),
+                    )
+                    for sample in chunk
+                ]
+        total = time.perf_counter() - start
+
+        latencies = sorted(elapsed for elapsed, _ in samples)
+        return {
+            'requests': len(samples),
+            'rps': len(samples) / total if total else None,
+            'mean_ms': 1000 * sum(latencies) / len(latencies),
+            'p50_ms': 1000 * percentile(latencies, 0.5),
+            'p95_ms': 1000 * percentile(latencies, 0.95),
+            'p99_ms': 1000 * percentile(latencies, 0.99),
+            'queries': sum(q for _, q in samples) / len(samples),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            '{:<16} {:>8.1f} req/s  p50 {:>7.2f}  p95 {:>7.2f}  '
+            'p99 {:>7.2f} ms  {:>5.1f} queries'.format(
+                name, result['rps'], result['p50_ms'], result['p95_ms'],
+                result['p99_ms'], result['queries'],
+            )
+        )
+
+    def compare(self, results, path):
+        with open(path) as baseline:
+            baseline = json.load(baseline)
+        allowed = 1 + self.options['tolerance'] / 100
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result['p95_ms'] > before['p95_ms'] * allowed:
+                regressions.append(
+                    f'{name}: p95 {before["p95_ms"]:.2f} -> '
+                    f'{result["p95_ms"]:.2f} ms'
+                )
+            if result['rps'] * allowed < before['rps']:
+                regressions.append(
+                    f'{name}: {before["rps"]:.1f} -> '
+                    f'{result["rps"]:.1f} req/s'
+                )
+            if result['queries'] > before['queries']:
+                regressions.append(
+                    f'{name}: {before["queries"]:.1f} -> '
+                    f'{result["queries"]:.1f} queries'
+                )
+        if regressions:
+            raise CommandError(
+                'Slower than baseline:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
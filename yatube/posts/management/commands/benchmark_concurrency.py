@@ -0,0 +1,108 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core.sqlite import pragmas
+from posts.benchmarks import Targets, percentile, scenario_client
+
+READS = ('index', 'group', 'profile', 'detail')
+WRITES = ('post_create', 'comment_create')
+
+
+def request(client, scenario, targets):
+    """Latency of one request and whether it succeeded."""
+    method, url, data = scenario(targets)
+    expected = 200 if method == 'get' else 302
+    start = time.monotonic()
+    try:
+        ok = getattr(client, method)(url, data).status_code == expected
+    except Exception:
+        # 'database is locked' and friends, counted as errors.
+        ok = False
+    return time.monotonic() - start, ok
+
+
+def worker(scenarios, targets, deadline):
+    """Run scenarios in turn until deadline, in a process of its own."""
+    clients = [scenario_client(name, targets) for name in scenarios]
+    samples = []
+    try:
+        while time.monotonic() < deadline:
+            client, scenario = clients[len(samples) % len(clients)]
+            samples.append(request(client, scenario, targets))
+    finally:
+        connections.close_all()
+    return samples
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure read throughput and latency while other processes keep '
+        'creating posts and comments.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Seconds to run for.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        targets = Targets(options['seed'])
+        self.describe_database()
+
+        workers = (
+            [READS] * options['readers'] + [WRITES] * options['writers']
+        )
+        # Processes, not threads: the GIL would serialize the requests
+        # before the database got a chance to.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(len(workers), mp_context=context) as pool:
+            start = time.monotonic()
+            deadline = start + options['duration']
+            futures = [
+                pool.submit(worker, scenarios, targets, deadline)
+                for scenarios in workers
+            ]
+            results = {'read': [], 'write': []}
+            for scenarios, future in zip(workers, futures):
+                kind = 'read' if scenarios is READS else 'write'
+                results[kind].extend(future.result())
+            total = time.monotonic() - start
+
+        for kind, samples in results.items():
+            self.report(kind, samples, total)
+        if not results['read']:
+            raise CommandError('No reads were made.')
+
+    def describe_database(self):
+        values = pragmas(connection) if connection.vendor == 'sqlite' else {}
+        values['CONN_MAX_AGE'] = connection.settings_dict['CONN_MAX_AGE']
+        mode = 'production' if settings.SQLITE_PRODUCTION else 'default'
+        self.stdout.write(f'SQLite {mode} mode: ' + ', '.join(
+            f'{name}={value}' for name, value in values.items()
+        ))
+
+    def report(self, kind, samples, total):
+        latencies = sorted(elapsed for elapsed, ok in samples if ok)
+        errors = len(samples) - len(latencies)
+        if not latencies:
+            self.stdout.write(f'{kind:<6} no successful requests, '
+                              f'{errors} errors')
+            return
+        self.stdout.write(
+            '{:<6} {:>8.1f} req/s  p50 {:>7.2f}  p95 {:>7.2f}  '
+            'p99 {:>7.2f} ms  {} errors'.format(
+                kind, len(latencies) / total,
+                1000 * percentile(latencies, 0.5),
+                1000 * percentile(latencies, 0.95),
+                1000 * percentile(latencies, 0.99),
+                errors,
+            )
+        )
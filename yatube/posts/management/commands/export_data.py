@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import DATASETS, FORMATS, export, guess_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a dataset to an NDJSON or CSV file in keyset batches, '
+        'resumable from the last finished batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=DATASETS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Guessed from the extension by default.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an interrupted export.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        rows = export(
+            options['dataset'], path,
+            options['format'] or guess_format(path),
+            batch_size=options['batch_size'],
+            resume=options['resume'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {rows} {options["dataset"]} to {path}'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy posts of authors back under the fan-out limit into the '
+        'feeds of their followers.'
+    )
+
+    def handle(self, *args, **options):
+        authors = list(feed.back_under_limit())
+        for author_id in authors:
+            feed.fan_out_author(author_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Fanned out {len(authors)} authors.'
+        ))
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import thumbnails
+from posts.models import Post
+
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = 'Build standard thumbnails for every existing post image.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of images processed in parallel.',
+        )
+
+    def build(self, post):
+        try:
+            thumbnails.build_all(post.image)
+        except Exception as error:
+            return post.image.name, error
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                close_old_connections()
+        return post.image.name, None
+
+    def batches(self, posts):
+        batch = list(islice(posts, BATCH_SIZE))
+        while batch:
+            yield batch
+            batch = list(islice(posts, BATCH_SIZE))
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('id', 'image')
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            # A single worker runs in this thread, no pool round trip.
+            run = pool.map if options['workers'] > 1 else map
+            for batch in self.batches(posts.iterator()):
+                for name, error in run(self.build, batch):
+                    if error is None:
+                        done += 1
+                        continue
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Thumbnails built for {done} images, {failed} failed.'
+        ))
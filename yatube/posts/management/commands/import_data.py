@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import (
+    DATASETS, FORMATS, guess_format, import_, rebuild_derived,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a dataset from an NDJSON or CSV file with batched bulk_create, '
+        'resumable from the last finished batch. Import users and groups '
+        'before the posts, comments and follows referring to them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=DATASETS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Guessed from the extension by default.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an interrupted import.')
+        parser.add_argument(
+            '--no-rebuild', action='store_false', dest='rebuild',
+            help='Skip counters, feeds and search index, for several '
+                 'imports in a row. Run the last one without it.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        rows = import_(
+            options['dataset'], path,
+            options['format'] or guess_format(path),
+            batch_size=options['batch_size'],
+            resume=options['resume'],
+        )
+        self.stdout.write(f'Imported {rows} {options["dataset"]} from {path}')
+        if options['rebuild']:
+            # bulk_create sends no signals, derived data is built at once.
+            self.stdout.write('Rebuilding counters, feeds and search index')
+            rebuild_derived()
+        self.stdout.write(self.style.SUCCESS('Import finished.'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute denormalized post, comment, follow and group counters.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report wrong counters, exit with an error if any.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        posts = Post.objects.all()
+        groups = Group.objects.all()
+        if options['check']:
+            return self.check_counters(users, posts, groups)
+
+        counters.rebuild_users(users)
+        counters.rebuild_posts(posts)
+        counters.rebuild_groups(groups)
+        self.stdout.write(self.style.SUCCESS('Counters rebuilt.'))
+
+    def check_counters(self, users, posts, groups):
+        wrong = 0
+        checked = counters.check(users, posts, groups)
+        for obj, name, stored, actual in checked:
+            wrong += 1
+            self.stdout.write(
+                f'{obj._meta.label} {obj.pk} {name}: '
+                f'stored {stored}, actual {actual}'
+            )
+        if wrong:
+            raise CommandError(f'{wrong} counters are inconsistent.')
+        self.stdout.write(self.style.SUCCESS('Counters are consistent.'))
@@ -0,0 +1,166 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import counters, feed
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import get_backend
+from posts.transfer import chunks, explicit_dates
+
+WORDS = (
+    'лето море город книга кофе утро вечер дорога музыка кино друг '
+    'работа отпуск горы река снег дождь солнце кот собака сад поезд '
+    'python django запрос индекс кэш страница лента подписка'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with generated users, groups, posts, comments '
+        'and follows for benchmarks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows', type=int, default=20000,
+            help='Follow edges, at most users - 1 per user.',
+        )
+        parser.add_argument('--days', type=int, default=365,
+                            help='Posts are spread over this many days.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, same seed same data.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days']).total_seconds()
+        prefix = f'seed{self.now:%Y%m%d%H%M%S}'
+
+        with explicit_dates():
+            users = self.create_users(prefix, options['users'])
+            user_ids = list(users.values_list('pk', flat=True))
+            groups = self.create_groups(prefix, options['groups'])
+            group_ids = list(groups.values_list('pk', flat=True))
+            posts = self.create_posts(options['posts'], user_ids, group_ids)
+            post_ids = list(posts.values_list('pk', flat=True))
+            self.create_comments(options['comments'], user_ids, post_ids)
+            self.create_follows(options['follows'], user_ids)
+
+        # bulk_create sends no signals, derived data is built at once.
+        self.stage('counters')
+        counters.rebuild_users(users)
+        counters.rebuild_posts(posts)
+        counters.rebuild_groups(groups)
+        self.stage('follow feeds')
+        feed.rebuild()
+        self.stage('search index')
+        get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS('Database seeded.'))
+
+    def stage(self, name, count=None):
+        suffix = f': {count}' if count is not None else ''
+        self.stdout.write(f'Seeding {name}{suffix}')
+
+    def text(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def date(self):
+        return self.now - timedelta(seconds=self.random.random() * self.span)
+
+    def insert(self, model, objects):
+        """bulk_create in batches, return a queryset of the new rows.
+
+        Rows are selected by a pk range, lists of millions of ids do not
+        fit into a query.
+        """
+        last_id = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        with transaction.atomic():
+            for chunk in chunks(objects, self.batch_size):
+                model.objects.bulk_create(chunk)
+        return model.objects.filter(pk__gt=last_id).order_by('pk')
+
+    def create_users(self, prefix, count):
+        self.stage('users', count)
+        password = make_password(None)
+        return self.insert(User, (
+            User(
+                username=f'{prefix}_{i}',
+                first_name=self.random.choice(WORDS).capitalize(),
+                password=password,
+            )
+            for i in range(count)
+        ))
+
+    def create_groups(self, prefix, count):
+        self.stage('groups', count)
+        return self.insert(Group, (
+            Group(
+                title=self.text(2),
+                slug=f'{prefix}-{i}',
+                description=self.text(10),
+            )
+            for i in range(count)
+        ))
+
+    def create_posts(self, count, user_ids, group_ids):
+        self.stage('posts', count)
+        choice = self.random.choice
+        return self.insert(Post, (
+            Post(
+                author_id=choice(user_ids),
+                group_id=choice(group_ids) if group_ids else None,
+                text=self.text(self.random.randint(5, 60)),
+                pub_date=self.date(),
+            )
+            for _ in range(count)
+        ))
+
+    def create_comments(self, count, user_ids, post_ids):
+        self.stage('comments', count)
+        if not post_ids:
+            return Comment.objects.none()
+        choice = self.random.choice
+        return self.insert(Comment, (
+            Comment(
+                post_id=choice(post_ids),
+                author_id=choice(user_ids),
+                text=self.text(self.random.randint(2, 20)),
+                created=self.date(),
+            )
+            for _ in range(count)
+        ))
+
+    def create_follows(self, count, user_ids):
+        """Spread count follow edges over users, without duplicates."""
+        self.stage('follows', count)
+        if len(user_ids) < 2:
+            return Follow.objects.none()
+        per_user, extra = divmod(count, len(user_ids))
+        return self.insert(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for i, user_id in enumerate(user_ids)
+            for author_id in self.authors_of(
+                user_id, user_ids, per_user + (i < extra)
+            )
+        ))
+
+    def authors_of(self, user_id, user_ids, count):
+        authors = set()
+        count = min(count, len(user_ids) - 1)
+        while len(authors) < count:
+            author_id = self.random.choice(user_ids)
+            if author_id != user_id:
+                authors.add(author_id)
+        return authors
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search '
+            'USING fts5(text, post_id UNINDEXED)'
+        )
+        for queryset, shift in (
+            (Post.objects.values_list('pk', 'text', 'pk'), 0),
+            (Comment.objects.values_list('pk', 'text', 'post_id'), 1),
+        ):
+            cursor.executemany(
+                'INSERT INTO posts_search (rowid, text, post_id) '
+                'VALUES (%s, %s, %s)',
+                [
+                    (pk * 2 + shift, text, post_id)
+                    for pk, text, post_id in queryset.iterator()
+                ],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 2.2.19 on 2026-10-18 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    GroupAuthorStats = apps.get_model('posts', 'GroupAuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.filter(group__isnull=False).order_by()
+    totals = {
+        row['group_id']: row
+        for row in posts.values('group_id').annotate(
+            total=Count('id'), last=Max('pub_date')
+        )
+    }
+    GroupStats.objects.bulk_create(
+        GroupStats(
+            group_id=group_id,
+            posts_count=totals.get(group_id, {}).get('total', 0),
+            last_post_date=totals.get(group_id, {}).get('last'),
+        )
+        for group_id in Group.objects.values_list('id', flat=True)
+    )
+    GroupAuthorStats.objects.bulk_create(
+        GroupAuthorStats(
+            group_id=row['group_id'],
+            author_id=row['author_id'],
+            posts_count=row['total'],
+        )
+        for row in posts.values('group_id', 'author_id').annotate(
+            total=Count('id')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupAuthorStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('last_post_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='groupstats',
+            index=models.Index(fields=['last_post_date'], name='group_stats_last_post_idx'),
+        ),
+        migrations.AddField(
+            model_name='groupauthorstats',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='groupauthorstats',
+            name='group',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='author_stats', to='posts.Group'),
+        ),
+        migrations.AddIndex(
+            model_name='groupauthorstats',
+            index=models.Index(fields=['group', 'posts_count'], name='group_author_posts_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupauthorstats',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='unique_group_author'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.19 on 2026-10-18 18:06
+
+import core.storage
+from django.db import migrations, models
+
+
+def hash_image_names(apps, schema_editor):
+    """Store existing images under their content hash.
+
+    The old files stay, cached pages and links may still point to them.
+    """
+    Post = apps.get_model('posts', 'Post')
+    storage = core.storage.ContentAddressedStorage()
+    names = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct()
+    for name in list(names):
+        if core.storage.IMMUTABLE_NAME.search(name) or not storage.exists(name):
+            continue
+        with storage.open(name) as file:
+            hashed = storage.save(name, file)
+        Post.objects.filter(image=name).update(image=hashed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_group_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(hash_image_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.19 on 2026-10-18 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_merged(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(feed_merged=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_merged',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_merged, migrations.RunPython.noop),
+    ]
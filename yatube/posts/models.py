@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -14,6 +16,17 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Post queryset that knows how to load a whole post card at once."""
+
+    def cards(self):
+        """Load author and group of every post in the same query.
+
+        Comment count is a denormalized column, so no join is needed.
+        """
+        return self.select_related('author', 'author__stats', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         help_text='Основной текст поста',
@@ -24,10 +37,12 @@ class Post(models.Model):
         verbose_name='Дата публикации',
         db_index=True,
     )
+    # author and group are indexed together with pub_date in Meta.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='posts'
+        related_name='posts',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -37,15 +52,38 @@ class Post(models.Model):
         related_name='posts',
         on_delete=models.SET_NULL,
         verbose_name='Группа',
+        db_index=False,
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         verbose_name='Картинка',
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        # Every post list filters by at most one column and is ordered by
+        # date and id, these indexes return its pages without sorting.
+        # They are ascending: read backwards they give the newest first,
+        # and the implicit trailing rowid stays in the same direction.
+        indexes = (
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -56,6 +94,7 @@ class Comment(models.Model):
         Post,
         related_name='comments',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -70,6 +109,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -82,7 +127,8 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='follower',
-        help_text='Подписчик'
+        help_text='Подписчик',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -90,3 +136,122 @@ class Follow(models.Model):
         related_name='following',
         help_text='Автор'
     )
+
+    class Meta:
+        # Also the index of everything looked up by user.
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+        )
+
+
+class UserStats(models.Model):
+    """Denormalized per user counters, kept current by posts.counters."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Posts of the user are merged into follow feeds on read instead of
+    # being copied into them, see posts.feed.
+    feed_merged = models.BooleanField(default=False)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class GroupStats(models.Model):
+    """Denormalized per group figures, kept current by posts.counters."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    last_post_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # The groups directory lists the recently active first.
+        indexes = (
+            models.Index(
+                fields=('last_post_date',),
+                name='group_stats_last_post_idx',
+            ),
+        )
+
+    def __str__(self):
+        return str(self.group)
+
+
+class GroupAuthorStats(models.Model):
+    """Posts of one author in one group, for top authors of groups."""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='author_stats',
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('group', 'author'),
+                name='unique_group_author',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('group', 'posts_count'),
+                name='group_author_posts_count_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.author} in {self.group}'
+
+
+class FeedEntry(models.Model):
+    """Post materialized into a follower's feed on write."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_entry',
+            ),
+        )
+        # post breaks ties of pub_date in feed order, see feed_posts.
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='feed_user_pub_date_post_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user} <- {self.post}'
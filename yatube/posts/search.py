@@ -0,0 +1,192 @@
+"""Full-text search over posts and their comments.
+
+The backend is chosen by settings.POSTS_SEARCH_BACKEND. SQLiteFTS5Backend
+keeps an FTS5 inverted index current through signals; SimpleSearchBackend
+is a LIKE based fallback for databases without FTS5.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+
+_backend = None
+
+
+def get_backend():
+    """Search backend configured in settings, created once."""
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.POSTS_SEARCH_BACKEND)()
+    return _backend
+
+
+class SearchResults:
+    """Lazy ranked list of posts, sliceable and countable for Paginator."""
+
+    def __init__(self, fetch_ids, count):
+        self._fetch_ids = fetch_ids
+        self._count = count
+
+    def count(self):
+        return self._count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        ids = self._fetch_ids(start, index.stop - start)
+        posts = Post.objects.cards().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class SearchBackend:
+    """Interface every search backend implements."""
+
+    def index_post(self, post):
+        raise NotImplementedError
+
+    def index_comment(self, comment):
+        raise NotImplementedError
+
+    def remove_post(self, post_id):
+        raise NotImplementedError
+
+    def remove_comment(self, comment_id):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Index every post and comment from scratch."""
+        raise NotImplementedError
+
+    def search(self, query):
+        """Posts matching query in their text or comments, best first."""
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Table scan search, needs no index at all."""
+
+    def index_post(self, post):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query):
+        posts = Post.objects.cards().filter(
+            Q(text__icontains=query) | Q(comments__text__icontains=query)
+        ).distinct()
+        return posts
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """SQLite FTS5 inverted index ranked by bm25.
+
+    Posts and comments share one table, rowid 2 * id for a post and
+    2 * id + 1 for a comment, so every update is a rowid lookup.
+    """
+    table = 'posts_search'
+    batch_size = 1000
+
+    def _replace(self, rows):
+        sql = (
+            f'INSERT OR REPLACE INTO {self.table} '
+            f'(rowid, text, post_id) VALUES (%s, %s, %s)'
+        )
+        with connection.cursor() as cursor:
+            # Single rows use execute, debug_toolbar fails to log
+            # executemany.
+            if len(rows) == 1:
+                cursor.execute(sql, rows[0])
+            elif rows:
+                cursor.executemany(sql, rows)
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [rowid]
+            )
+
+    def index_post(self, post):
+        self._replace([(post.pk * 2, post.text, post.pk)])
+
+    def index_comment(self, comment):
+        self._replace([(comment.pk * 2 + 1, comment.text, comment.post_id)])
+
+    def remove_post(self, post_id):
+        self._delete(post_id * 2)
+
+    def remove_comment(self, comment_id):
+        self._delete(comment_id * 2 + 1)
+
+    @transaction.atomic
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        sources = (
+            (Post.objects.values_list('pk', 'text', 'pk'), 0),
+            (Comment.objects.values_list('pk', 'text', 'post_id'), 1),
+        )
+        for queryset, shift in sources:
+            batch = []
+            for pk, text, post_id in queryset.iterator():
+                batch.append((pk * 2 + shift, text, post_id))
+                if len(batch) >= self.batch_size:
+                    self._replace(batch)
+                    batch = []
+            self._replace(batch)
+
+    @staticmethod
+    def match_expression(query):
+        """Quote every word, so user input is never FTS5 syntax."""
+        words = query.split()
+        return ' '.join(
+            '"{}"'.format(word.replace('"', '""')) for word in words
+        )
+
+    def search(self, query):
+        expression = self.match_expression(query)
+        # Only the best POSTS_SEARCH_MAX_RESULTS matches are grouped by
+        # post, FTS5 finds them without ranking every matching row.
+        params = [expression, settings.POSTS_SEARCH_MAX_RESULTS]
+        matches = (
+            f'SELECT post_id, rank FROM {self.table} '
+            f'WHERE {self.table} MATCH %s ORDER BY rank LIMIT %s'
+        )
+
+        def fetch_ids(offset, limit):
+            if not expression:
+                return []
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT post_id FROM ({matches}) GROUP BY post_id '
+                    f'ORDER BY MIN(rank) LIMIT %s OFFSET %s',
+                    params + [limit, offset],
+                )
+                return [row[0] for row in cursor.fetchall()]
+
+        def count():
+            if not expression:
+                return 0
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(DISTINCT post_id) FROM ({matches})',
+                    params,
+                )
+                return cursor.fetchone()[0]
+
+        return SearchResults(fetch_ids, count)
@@ -0,0 +1,73 @@
+import logging
+
+from django import template
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from ..thumbnails import resolve_many, variants
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+@register.simple_tag
+def post_thumbnails(posts):
+    """Thumbnails of the images of posts, for post_picture.
+
+    {% post_thumbnails page_obj as thumbnails %} looks them all up at
+    once, see posts.thumbnails.resolve_many.
+    """
+    return resolve_many(post.image for post in posts)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, sizes=None, css_class='card-img my-2',
+                 thumbnails=None):
+    """Render a post image as <picture> with a srcset per format.
+
+    Variants that are not built yet are left out; with none built the
+    original image is shown. Errors are logged, not raised, like the
+    sorl {% thumbnail %} tag does. Variants missing from thumbnails, the
+    result of post_thumbnails, are looked up one by one.
+    """
+    sources = {}
+    thumbnails = thumbnails or {}
+    if image:
+        for width, image_format, geometry, options in variants():
+            thumbnail = thumbnails.get((image.name, geometry, image_format))
+            try:
+                if thumbnail is None:
+                    thumbnail = get_thumbnail(image, geometry, **options)
+            except Exception:
+                if thumbnail_settings.THUMBNAIL_DEBUG:
+                    raise
+                logger.exception('Post picture of %s failed', image)
+                break
+            if thumbnail.name == image.name:
+                continue
+            sources.setdefault(image_format, []).append(
+                f'{thumbnail.url} {width}w'
+            )
+
+    formats = settings.POST_IMAGE_VARIANTS['formats']
+    fallback = sources.pop(formats[-1], None)
+    return {
+        'image': image,
+        'sources': [
+            {'type': MIME_TYPES[name], 'srcset': ', '.join(sources[name])}
+            for name in formats if name in sources
+        ],
+        'srcset': fallback and ', '.join(fallback),
+        'src': fallback and fallback[-1].rsplit(' ', 1)[0],
+        'sizes': sizes or settings.POST_IMAGE_SIZES,
+        'css_class': css_class,
+    }
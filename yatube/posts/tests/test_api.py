@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..views import POSTS_ON_PAGE
+
+
+class ApiTests(TestCase):
+    """JSON API tests."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(POSTS_ON_PAGE + 2):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Post {i}'
+            )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Comment'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_post_lists(self):
+        """Every list returns a page of posts and a cursor to the next."""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:profile', kwargs={'username': 'author'}),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.reader_client.get(url).json()
+                self.assertEqual(len(data['results']), POSTS_ON_PAGE)
+                first = data['results'][0]
+                self.assertEqual(first['id'], self.post.pk)
+                self.assertEqual(first['author'], 'author')
+                self.assertEqual(first['group'], 'group')
+                self.assertEqual(first['comments_count'], 1)
+                self.assertIsNone(data['previous'])
+
+                data = self.reader_client.get(
+                    url, {'after': data['next']}
+                ).json()
+                self.assertEqual(len(data['results']), 2)
+                self.assertIsNone(data['next'])
+                self.assertIsNotNone(data['previous'])
+
+    def test_post_detail_and_comments(self):
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.client.get(url).json()['text'], 'Post 11')
+        url = reverse('api:post_comments', kwargs={'post_id': self.post.pk})
+        data = self.client.get(url).json()
+        self.assertEqual(data['results'], [{
+            'id': self.comment.pk,
+            'post': self.post.pk,
+            'author': 'reader',
+            'text': 'Comment',
+            'created': data['results'][0]['created'],
+        }])
+
+    def test_missing_objects(self):
+        urls = (
+            reverse('api:post_detail', kwargs={'post_id': 0}),
+            reverse('api:post_comments', kwargs={'post_id': 0}),
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile', kwargs={'username': 'missing'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertFalse(response.has_header('ETag'))
+
+    def test_follow_requires_login(self):
+        response = self.client.get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_read_only(self):
+        response = self.reader_client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_conditional_get(self):
+        """Unchanged lists answer 304, a new post changes the ETag."""
+        url = reverse('api:index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(author=self.author, text='New')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_edit_changes_etag(self):
+        """Edits keep dates but still change the ETag."""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        self.post.text = 'Edited'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['text'], 'Edited')
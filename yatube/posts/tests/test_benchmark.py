@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserStats
+
+
+class BenchmarkTests(TestCase):
+    """Data generator and benchmark commands tests."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=20, groups=3, posts=60, comments=100,
+            follows=50, batch_size=25, stdout=StringIO(),
+        )
+
+    def test_seed_data(self):
+        """Generator creates consistent data with derived rows."""
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), 50)
+        self.assertEqual(UserStats.objects.count(), 20)
+        self.assertTrue(FeedEntry.objects.exists())
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater(len(set(dates)), 1)
+        call_command('rebuild_counters', check=True, stdout=StringIO())
+
+    def test_benchmark_and_compare(self):
+        """Every scenario runs, a baseline is saved and compared."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            out = StringIO()
+            call_command(
+                'benchmark', requests=3, warmup=1, save=path, stdout=out
+            )
+            with open(path) as baseline:
+                results = json.load(baseline)
+            self.assertEqual(len(results), 7)
+            self.assertEqual(results['index']['requests'], 3)
+
+            for result in results.values():
+                result['queries'] = 0
+            with open(path, 'w') as baseline:
+                json.dump(results, baseline)
+            with self.assertRaisesMessage(CommandError, 'queries'):
+                call_command(
+                    'benchmark', requests=3, warmup=0, compare=path,
+                    scenarios='index', stdout=out,
+                )
@@ -1,8 +1,20 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Post, User
+from core import replicas
+
+from ..models import Comment, Follow, Group, Post, User
 
 
 class CacheTests(TestCase):
@@ -11,28 +23,186 @@ class CacheTests(TestCase):
     def setUpClass(cls) -> None:
         super().setUpClass()
         cls.user = User.objects.create(username='HasNoName')
+        cls.group = Group.objects.create(title='Test Group', slug='test')
         cls.post = Post.objects.create(
             author=cls.user,
             text='Some text',
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
         )
 
     def setUp(self) -> None:
         super().setUp()
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
-    def test_cache_main(self):
-        """Cache working test."""
-        response = self.authorized_client.get(reverse('posts:index'))
-        old_content = response.content
-        Post.objects.all().delete()
+    def test_fragments_reused(self):
+        """Second render reads post cards from the cache."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(url)
+                self.assertFalse(
+                    any('posts_comment' in query['sql'] for query in queries)
+                )
+
+    def test_fragments_shared_between_users(self):
+        """Post lists are cached once, edit links only show to authors."""
+        reader = Client()
+        reader.force_login(User.objects.create(username='reader'))
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        for url in self.urls[:2]:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertContains(self.authorized_client.get(url), edit_url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = reader.get(url)
+                self.assertFalse(
+                    any('posts_comment' in query['sql'] for query in queries)
+                )
+                self.assertContains(response, self.post.text)
+                self.assertNotContains(response, edit_url)
+                self.assertNotContains(response, '<!--hole:')
+
+    def test_follow_fragments_per_user(self):
+        """Every user's /follow/ shows the authors they follow."""
+        first = User.objects.create(username='first')
+        second = User.objects.create(username='second')
+        Follow.objects.create(user=first, author=self.user)
+        Post.objects.create(author=first, text='Post of first')
+        Follow.objects.create(user=second, author=first)
+        url = reverse('posts:follow_index')
+        first_client, second_client = Client(), Client()
+        first_client.force_login(first)
+        second_client.force_login(second)
+        self.assertContains(first_client.get(url), self.post.text)
+        response = second_client.get(url)
+        self.assertContains(response, 'Post of first')
+        self.assertNotContains(response, self.post.text)
+
+    def test_header_cached_per_user(self):
+        reader = Client()
+        reader.force_login(User.objects.create(username='reader'))
+        url = reverse('posts:groups')
+        self.assertContains(
+            self.authorized_client.get(url), 'Пользователь: HasNoName'
+        )
+        response = reader.get(url)
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertNotContains(response, 'Пользователь: HasNoName')
+        self.assertContains(self.client.get(url), 'Войти')
+
+    def rename_group(self):
+        self.group.title = 'Renamed'
+        self.group.save()
+
+    def test_fragments_invalidated(self):
+        """Writes show up on the very next request."""
+        changes = {
+            'post created': lambda: Post.objects.create(
+                author=self.user, text='Fresh post', group=self.group
+            ),
+            'comment created': lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Fresh comment'
+            ),
+            'group renamed': self.rename_group,
+            'posts deleted': lambda: Post.objects.all().delete(),
+        }
+        for name, change in changes.items():
+            responses = [self.authorized_client.get(url) for url in self.urls]
+            change()
+            for url, old in zip(self.urls, responses):
+                with self.subTest(url=url, change=name):
+                    new = self.authorized_client.get(url)
+                    self.assertNotEqual(old.content, new.content)
+
+    def test_guest_index_served_once(self):
+        """Guests share one computed index until something is written."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        # Only the conditional GET validator is read.
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, self.post.text)
 
-        response = self.authorized_client.get(reverse('posts:index'))
-        new_content = response.content
-        self.assertEqual(old_content, new_content)
+        Post.objects.create(author=self.user, text='Fresh post')
+        self.assertContains(self.client.get(url), 'Fresh post')
 
-        """Content changing test."""
+    def test_stale_index_has_no_validators(self):
+        """A stale page is not stamped with the ETag of the new one."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.user, text='Fresh post')
+        # Another request is computing the new page.
+        cache.add(f'singleflight:view:posts.views.index:{url}:lock', 1)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Fresh post')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('max-age=0', response['Cache-Control'])
+
+        cache.delete(f'singleflight:view:posts.views.index:{url}:lock')
+        response = self.client.get(url)
+        self.assertContains(response, 'Fresh post')
+        self.assertTrue(response.has_header('ETag'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaCacheTests(TransactionTestCase):
+    """Fragments rendered from a lagging replica, on real SQLite files."""
+
+    def setUp(self):
         cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
-        new_content = response.content
-        self.assertNotEqual(old_content, new_content)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        primary = os.path.join(directory.name, 'primary.sqlite3')
+        self.replica = os.path.join(directory.name, 'replica.sqlite3')
+        # The schema of the test database, on a file.
+        target = sqlite3.connect(primary)
+        connection.ensure_connection()
+        connection.connection.backup(target)
+        target.close()
+        self.use_file('default', primary)
+        self.use_file('replica', self.replica)
+
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(author=self.author, text='Old post')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        replicas.replicate(primary, self.replica)
+        self.url = reverse('posts:profile', kwargs={'username': 'author'})
+
+    def use_file(self, alias, path):
+        """Point alias at the SQLite file path for this test."""
+        wrapper = DatabaseWrapper(
+            dict(connections.databases['default'], NAME=path), alias
+        )
+        previous = getattr(connections._connections, alias, None)
+        setattr(connections._connections, alias, wrapper)
+
+        def restore():
+            wrapper.close()
+            if previous is None:
+                delattr(connections._connections, alias)
+            else:
+                setattr(connections._connections, alias, previous)
+        self.addCleanup(restore)
+
+    def test_replica_pages_are_not_served_to_pinned_clients(self):
+        self.author_client.post(
+            reverse('posts:post_create'), {'text': 'New post'}
+        )
+        # A guest reads the replica, which has not caught up yet.
+        self.assertNotContains(self.client.get(self.url), 'New post')
+        self.assertContains(self.author_client.get(self.url), 'New post')
+
+        call_command('sync_replicas', stdout=StringIO())
+        self.assertContains(self.client.get(self.url), 'New post')
@@ -1,6 +1,12 @@
+from datetime import timedelta
+
 from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Post, User
+from ..models import Comment, Post, User
+from ..transfer import explicit_dates
+from ..views import COMMENTS_ON_PAGE
 
 
 class CommentsTests(TestCase):
@@ -44,3 +50,61 @@ class CommentsTests(TestCase):
         response = self.client.get(f'/posts/{self.post.id}/')
         comment = response.context['comments'][0]
         self.assertEqual(comment.text, self.new_text)
+
+
+class CommentPagesTests(TestCase):
+    """Comments are loaded page by page."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='HasNoName')
+        cls.post = Post.objects.create(author=cls.user, text='Test Text')
+        now = timezone.now()
+        with explicit_dates():
+            Comment.objects.bulk_create(
+                Comment(
+                    post=cls.post, author=cls.user, text=f'Comment {i}',
+                    created=now - timedelta(minutes=i),
+                )
+                for i in range(COMMENTS_ON_PAGE + 5)
+            )
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id}
+        )
+        cls.comments_url = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.id}
+        )
+
+    def test_detail_shows_newest_page(self):
+        """Post page renders one page of comments and a load more link."""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertEqual(comments[0].text, 'Comment 0')
+        self.assertContains(response, comments.next_cursor)
+
+        response = self.client.get(
+            self.detail_url, {'after': comments.next_cursor}
+        )
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertFalse(response.context['comments'].has_next())
+
+    def test_load_more(self):
+        """JSON endpoint continues where the page stopped."""
+        page = self.client.get(self.detail_url).context['comments']
+        response = self.client.get(
+            self.comments_url, {'after': page.next_cursor}
+        )
+        data = response.json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            [f'Comment {i}' for i in range(COMMENTS_ON_PAGE,
+                                           COMMENTS_ON_PAGE + 5)],
+        )
+        self.assertEqual(data['comments'][0]['author'], self.user.username)
+        self.assertIsNone(data['next'])
+
+    def test_load_more_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,171 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..counters import top_authors
+from ..models import (Comment, Follow, Group, GroupAuthorStats, GroupStats,
+                      Post, User, UserStats)
+
+
+class CountersTests(TestCase):
+    """Denormalized counters tests."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        cls.author = User.objects.create(username='Author')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Creates and deletes move counters both ways."""
+        post = Post.objects.create(author=self.author, text='Test')
+        Comment.objects.create(post=post, author=self.user, text='Hi')
+        Follow.objects.create(user=self.user, author=self.author)
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+
+        post.comments.all().delete()
+        Follow.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_counters_stop_at_zero(self):
+        """Deleting rows created past the signals does not fail."""
+        group = Group.objects.create(title='Group', slug='group')
+        post = Post.objects.create(author=self.author, text='Test')
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.user, text='Hi')]
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=self.user, author=self.author)]
+        )
+        Post.objects.bulk_create(
+            [Post(author=self.author, group=group, text='Bulk')]
+        )
+
+        post.comments.all().delete()
+        Follow.objects.all().delete()
+        Post.objects.filter(group=group).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        self.assertEqual(GroupStats.objects.get(group=group).posts_count, 0)
+
+    def test_check_and_rebuild(self):
+        """Checker finds broken counters and rebuild fixes them."""
+        post = Post.objects.create(author=self.author, text='Test')
+        Comment.objects.create(post=post, author=self.user, text='Hi')
+        Post.objects.update(comments_count=5)
+        UserStats.objects.filter(user=self.user).delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', check=True, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+
+class GroupStatsTests(TestCase):
+    """Group statistics tests."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Author')
+        cls.other = User.objects.create(username='Other')
+        cls.group = Group.objects.create(title='Group', slug='group')
+        cls.second = Group.objects.create(title='Second', slug='second')
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def authors(self, group):
+        return dict(GroupAuthorStats.objects.filter(
+            group=group
+        ).values_list('author__username', 'posts_count'))
+
+    def test_stats_follow_writes(self):
+        """Creating, moving and deleting posts keep group stats current."""
+        first = Post.objects.create(
+            author=self.author, group=self.group, text='First'
+        )
+        last = Post.objects.create(
+            author=self.other, group=self.group, text='Last'
+        )
+        stats = self.stats(self.group)
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.last_post_date, last.pub_date)
+        self.assertEqual(self.authors(self.group), {'Author': 1, 'Other': 1})
+
+        last.group = self.second
+        last.save()
+        stats = self.stats(self.group)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.last_post_date, first.pub_date)
+        self.assertEqual(self.authors(self.group)['Other'], 0)
+        self.assertEqual(self.stats(self.second).posts_count, 1)
+
+        last.text = 'Edited'
+        last.save()
+        self.assertEqual(self.stats(self.second).posts_count, 1)
+
+        first.delete()
+        stats = self.stats(self.group)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertIsNone(stats.last_post_date)
+        call_command('rebuild_counters', check=True, stdout=StringIO())
+
+    def test_top_authors(self):
+        for _ in range(2):
+            Post.objects.create(author=self.other, group=self.group, text='')
+        Post.objects.create(author=self.author, group=self.group, text='')
+        authors = top_authors([self.group.pk, self.second.pk], limit=1)
+        self.assertEqual(
+            [row.author for row in authors[self.group.pk]], [self.other]
+        )
+        self.assertEqual(authors[self.second.pk], [])
+
+    def test_check_and_rebuild(self):
+        Post.objects.create(author=self.author, group=self.group, text='')
+        GroupStats.objects.update(posts_count=7)
+        GroupAuthorStats.objects.all().delete()
+        GroupStats.objects.filter(group=self.second).delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', check=True, stdout=StringIO())
+        self.assertEqual(self.stats(self.group).posts_count, 1)
+        self.assertEqual(self.authors(self.group), {'Author': 1})
+
+    def test_pages_show_stats(self):
+        Post.objects.create(author=self.author, group=self.group, text='')
+        response = self.client.get(reverse('posts:groups'))
+        rows = list(response.context['page_obj'])
+        self.assertEqual(rows[0].group, self.group)
+        self.assertEqual(rows[0].posts_count, 1)
+        self.assertEqual(
+            [row.author for row in rows[0].top_authors], [self.author]
+        )
+        self.assertContains(response, self.second.title)
+
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        )
+        self.assertEqual(response.context['stats'].posts_count, 1)
+        self.assertContains(response, 'активные авторы')
@@ -0,0 +1,117 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import feed
+from ..models import FeedEntry, Follow, Post, User, UserStats
+
+
+class FeedTests(TestCase):
+    """Materialized follow feed tests."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        cls.author = User.objects.create(username='Author')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Written before the follow',
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Old posts land on follow, new ones on create."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.feed(), [self.old_post])
+
+        new_post = Post.objects.create(author=self.author, text='New')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=new_post).exists()
+        )
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_cleans_feed(self):
+        """Unfollowed author's posts leave the feed."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_merged_on_read(self):
+        """Authors over the limit are read from Post directly."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='New')
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1, FEED_FANOUT_HYSTERESIS=0)
+    def test_author_back_under_limit_is_fanned_out(self):
+        """Posts of the celebrity era stay once merging on read stops."""
+        other = User.objects.create(username='Other')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='New')
+        self.assertFalse(FeedEntry.objects.filter(post=new_post).exists())
+
+        # The unfollow copies nothing, the author is merged until then.
+        Follow.objects.filter(user=other).delete()
+        self.assertFalse(FeedEntry.objects.filter(post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+        call_command('fan_out_feeds', stdout=StringIO())
+        self.assertFalse(UserStats.objects.get(user=self.author).feed_merged)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=new_post).exists()
+        )
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1, FEED_FANOUT_HYSTERESIS=1)
+    def test_follows_around_limit_copy_nothing(self):
+        other = User.objects.create(username='Other')
+        Follow.objects.create(user=self.user, author=self.author)
+        for _ in range(2):
+            Follow.objects.create(user=other, author=self.author)
+            Follow.objects.filter(user=other).delete()
+        call_command('fan_out_feeds', stdout=StringIO())
+        self.assertTrue(UserStats.objects.get(user=self.author).feed_merged)
+
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertTrue(UserStats.objects.get(user=self.author).feed_merged)
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=0, FEED_FANOUT_HYSTERESIS=0)
+    def test_writes_during_fan_out_are_caught_up(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        other = User.objects.create(username='Other')
+        copy = feed._copy
+        written = []
+
+        def copy_and_write(follows, posts):
+            copy(follows, posts)
+            if not written:
+                written.append(Post.objects.create(
+                    author=self.author, text='During the copy'
+                ))
+                Follow.objects.create(user=other, author=self.author)
+
+        with mock.patch.object(feed, '_copy', copy_and_write), \
+                self.settings(FEED_FANOUT_LIMIT=2):
+            feed.fan_out_author(self.author.pk)
+        for user in (self.user, other):
+            self.assertEqual(
+                set(FeedEntry.objects.filter(
+                    user=user
+                ).values_list('post', flat=True)),
+                {self.old_post.pk, written[0].pk},
+            )
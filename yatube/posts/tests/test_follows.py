@@ -1,3 +1,6 @@
+from unittest import mock
+
+from django.db.models.query import QuerySet
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -55,6 +58,37 @@ class FollowsTests(TestCase):
             ).exists()
         )
 
+    def test_concurrent_follow(self):
+        """A follow created by a concurrent request is not an error."""
+        url = reverse(
+            'posts:profile_follow', kwargs={'username': self.username}
+        )
+        get, exists = QuerySet.get, QuerySet.exists
+        raced = []
+
+        def race(queryset):
+            # The other request creates the row after this one looked.
+            if queryset.model is not Follow or raced:
+                return False
+            raced.append(Follow.objects.create(
+                user=self.user, author=self.another_user
+            ))
+            return True
+
+        def get_after_race(queryset, *args, **kwargs):
+            if race(queryset):
+                raise Follow.DoesNotExist
+            return get(queryset, *args, **kwargs)
+
+        def exists_after_race(queryset):
+            return not race(queryset) and exists(queryset)
+
+        with mock.patch.object(QuerySet, 'get', get_after_race), \
+                mock.patch.object(QuerySet, 'exists', exists_after_race):
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Follow.objects.count(), 1)
+
     def test_index_follow(self):
         """"""
         # Followed user have post on follow page
@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..utils import CursorPage, decode_cursor, encode_cursor
+from ..views import POSTS_ON_PAGE
+
+
+class CursorPaginatorTests(TestCase):
+    """Keyset pagination tests."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Test Group',
+            slug='test_slug',
+        )
+        cls.posts_count = POSTS_ON_PAGE + 3
+        Post.objects.bulk_create(
+            Post(text=f'Test {i}', author=cls.user, group=cls.group)
+            for i in range(cls.posts_count)
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_cursor_roundtrip(self):
+        """Cursor survives encoding and rejects garbage."""
+        post = Post.objects.first()
+        cursor = encode_cursor(post.pub_date, post.pk)
+        self.assertEqual(decode_cursor(cursor), (post.pub_date, post.pk))
+        self.assertIsNone(decode_cursor('not a cursor'))
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_walk_older_and_newer(self):
+        """Older and newer links cover every post exactly once."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                self.assertIsInstance(first, CursorPage)
+                self.assertFalse(first.has_previous())
+                self.assertEqual(len(first), POSTS_ON_PAGE)
+
+                second = self.client.get(
+                    url, {'after': first.next_cursor}
+                ).context['page_obj']
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    [post.pk for post in first] + [post.pk for post in second],
+                    expected,
+                )
+
+                back = self.client.get(
+                    url, {'before': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in back], [post.pk for post in first]
+                )
+                self.assertFalse(back.has_previous())
+
+    def test_cursor_overrides_numbered_mode(self):
+        """Cursor links work while numbered mode is the default."""
+        response = self.client.get(self.urls[0], {'after': 'garbage'})
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj, CursorPage)
+        self.assertEqual(len(page_obj), POSTS_ON_PAGE)
+        self.assertContains(response, '?after=')
@@ -0,0 +1,199 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import encode_cursor
+from ..views import POSTS_ON_PAGE
+
+
+class QueryBudgetTests(TestCase):
+    """Pages must not issue queries per rendered post."""
+    # Guest pages and extra queries for the session and user lookups
+    # of a logged in client.
+    budgets = {
+        'posts:index': 2,
+        'posts:group_list': 3,
+        'posts:profile': 3,
+        'posts:post_detail': 2,
+        'posts:follow_index': 3,
+        'posts:groups': 3,
+    }
+    auth_queries = 2
+    # The newest date lookup of posts.conditional, made before rendering.
+    validator_queries = 1
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Test Group', slug='test')
+        for i in range(POSTS_ON_PAGE + 2):
+            author = User.objects.create_user(username=f'Author{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                text=f'Test {i}', author=author, group=cls.group
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Hi')
+        cls.post = post
+        Post.objects.create(text='Mine', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assertQueryBudget(self, budget, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), budget,
+            '\n'.join(query['sql'] for query in queries),
+        )
+        return [query['sql'] for query in queries]
+
+    def test_query_budgets(self):
+        """Every post list and detail view stays within its budget."""
+        urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.user.username}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:groups': reverse('posts:groups'),
+        }
+        for name, url in urls.items():
+            with self.subTest(view=name):
+                self.assertQueryBudget(
+                    self.budgets[name] + self.auth_queries
+                    + self.validator_queries,
+                    url,
+                )
+
+    def test_no_aggregates_on_profile_and_detail(self):
+        """Counters on profile and detail pages are denormalized."""
+        urls = (
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                queries = self.assertQueryBudget(10, url)
+                self.assertFalse(
+                    [sql for sql in queries if 'COUNT(' in sql.upper()]
+                )
+
+
+class QueryPlanTests(TestCase):
+    """Every query of the hot views is answered from an index."""
+    # Walking an index in order is fine, the LIMIT stops it early. Rows
+    # of a derived table are already read through indexes.
+    allowed_scans = ('USING INDEX', 'USING COVERING INDEX', 'SCAN subquery')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='Test Group', slug='test')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(POSTS_ON_PAGE + 2):
+            cls.post = Post.objects.create(
+                text=f'Test {i}', author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Hi'
+            )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': cls.author.username}
+            ),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+            reverse('posts:follow_index'),
+            reverse('posts:groups'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedQueries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for step in self.plan(sql):
+                full_scan = step.startswith('SCAN') and not any(
+                    allowed in step for allowed in self.allowed_scans
+                )
+                self.assertFalse(
+                    full_scan or 'TEMP B-TREE' in step, f'{step}\n{sql}'
+                )
+        return response
+
+    def test_numbered_pages_use_indexes(self):
+        """Numbered pages neither scan tables nor sort rows."""
+        for url in self.urls:
+            for page in (1, 2):
+                with self.subTest(url=url, page=page):
+                    self.assertIndexedQueries(f'{url}?page={page}')
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_pages_use_indexes(self):
+        """Keyset pages neither scan tables nor sort rows."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.assertIndexedQueries(url)
+                page_obj = response.context.get('page_obj')
+                if not getattr(page_obj, 'is_cursor', False):
+                    continue
+                cursor = page_obj.next_cursor
+                self.assertIndexedQueries(f'{url}?after={cursor}')
+                self.assertIndexedQueries(f'{url}?before={cursor}')
+
+    def test_comment_pages_use_indexes(self):
+        """Pages of comments are read from the post and date index."""
+        comment = self.post.comments.first()
+        cursor = encode_cursor(comment.created, comment.pk)
+        for name in ('posts:post_detail', 'posts:post_comments'):
+            url = reverse(name, kwargs={'post_id': self.post.id})
+            with self.subTest(url=url):
+                self.assertIndexedQueries(url)
+                self.assertIndexedQueries(f'{url}?after={cursor}')
+
+    def test_api_uses_indexes(self):
+        """API lists read the same indexes as the pages."""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:profile', kwargs={'username': self.author.username}),
+            reverse('api:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('api:post_comments', kwargs={'post_id': self.post.id}),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cursor = self.assertIndexedQueries(url).json().get('next')
+                if cursor:
+                    self.assertIndexedQueries(f'{url}?after={cursor}')
@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+from ..search import get_backend
+from ..views import POSTS_ON_PAGE
+
+
+class SearchTests(TestCase):
+    """Full-text search tests."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост про кошек и котят'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Пост про собак'
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'])
+
+    def test_search_finds_post_text(self):
+        """Words of post text find the post."""
+        self.assertEqual(self.search('кошек'), [self.post])
+        self.assertEqual(self.search('пост собак'), [self.other])
+
+    def test_search_finds_comments(self):
+        """Comment text finds the commented post."""
+        Comment.objects.create(
+            post=self.other, author=self.user, text='Нужен ошейник'
+        )
+        self.assertEqual(self.search('ошейник'), [self.other])
+
+    def test_search_follows_edits_and_deletes(self):
+        """Index is updated when posts change or disappear."""
+        self.post.text = 'Пост про попугаев'
+        self.post.save()
+        self.assertEqual(self.search('кошек'), [])
+        self.assertEqual(self.search('попугаев'), [self.post])
+
+        self.post.delete()
+        self.assertEqual(self.search('попугаев'), [])
+
+    def test_search_ranks_best_match_first(self):
+        """Post matching the query more closely comes first."""
+        best = Post.objects.create(
+            author=self.user, text='собак собак собак'
+        )
+        self.assertEqual(self.search('собак'), [best, self.other])
+
+    def test_query_is_not_fts_syntax(self):
+        """Operators and quotes in the query are searched as words."""
+        for query in ('"', 'кошек OR', 'NEAR(', '*', '   '):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_search_paginates(self):
+        """Results are split by pages that keep the query."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Заметка {i}')
+            for i in range(POSTS_ON_PAGE + 3)
+        )
+        get_backend().rebuild()
+        self.assertEqual(len(self.search('заметка')), POSTS_ON_PAGE)
+        self.assertEqual(len(self.search('заметка', page=2)), 3)
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'заметка'}
+        )
+        self.assertContains(response, '?q=%D0%B7%D0%B0')
+
+    def test_rebuild_command(self):
+        """Command restores a lost index."""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search')
+        self.assertEqual(self.search('кошек'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('кошек'), [self.post])
@@ -0,0 +1,142 @@
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+
+from .. import thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    """Thumbnail pre-generation tests."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        content = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(content, 'JPEG')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Test',
+            image=SimpleUploadedFile('red.jpg', content.getvalue()),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_request_never_builds(self):
+        """Missing thumbnail is queued, original is returned meanwhile."""
+        with mock.patch.object(thumbnails, 'queue') as queue:
+            image = get_thumbnail(self.post.image, '10x10', crop='center')
+        self.assertEqual(image.name, self.post.image.name)
+        queue.assert_called_once()
+
+    def test_prebuilt_thumbnail_served(self):
+        """Thumbnails built by the backfill are read by templates."""
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        image = get_thumbnail(
+            self.post.image, '480x270',
+            crop='center', upscale=True, format='WEBP',
+        )
+        self.assertTrue(image.name.endswith('.webp'))
+        self.assertEqual((image.width, image.height), (480, 270))
+
+    def test_picture_srcset(self):
+        """Post picture lists every built variant per format."""
+        template = Template('{% load post_images %}{% post_picture image %}')
+        with mock.patch.object(thumbnails, 'queue'):
+            html = template.render(Context({'image': self.post.image}))
+        self.assertIn(f'src="{self.post.image.url}"', html)
+        self.assertNotIn('srcset', html)
+
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        html = template.render(Context({'image': self.post.image}))
+        self.assertIn('type="image/webp"', html)
+        for width in (480, 960, 1440, 1920):
+            self.assertEqual(html.count(f' {width}w'), 2)
+
+    def test_resolve_many(self):
+        """A page of images is resolved with one query, then none."""
+        with mock.patch.object(thumbnails, 'queue'):
+            self.assertEqual(thumbnails.resolve_many([self.post.image]), {})
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        cache.clear()
+        with self.assertNumQueries(1):
+            resolved = thumbnails.resolve_many([self.post.image] * 3)
+        self.assertEqual(len(resolved), len(list(thumbnails.variants())))
+        thumbnail = resolved[(self.post.image.name, '480x270', 'WEBP')]
+        self.assertEqual((thumbnail.width, thumbnail.height), (480, 270))
+        with self.assertNumQueries(0):
+            again = thumbnails.resolve_many([self.post.image])
+        self.assertEqual(
+            {key: image.name for key, image in again.items()},
+            {key: image.name for key, image in resolved.items()},
+        )
+
+    def test_picture_with_resolved_thumbnails(self):
+        """Resolved thumbnails render the same without lookups per image."""
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        context = {'posts': [self.post, self.post]}
+        single = Template(
+            '{% load post_images %}'
+            '{% for post in posts %}{% post_picture post.image %}{% endfor %}'
+        ).render(Context(context))
+        batched = Template(
+            '{% load post_images %}'
+            '{% post_thumbnails posts as thumbnails %}'
+            '{% for post in posts %}'
+            '{% post_picture post.image thumbnails=thumbnails %}'
+            '{% endfor %}'
+        )
+        with mock.patch.object(
+            KVStore, '_get_raw', side_effect=AssertionError
+        ):
+            self.assertEqual(batched.render(Context(context)), single)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_no_workers_builds_on_commit(self):
+        """Without workers thumbnails are done when the commit is."""
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda submit: submit()
+        ), mock.patch.object(thumbnails, 'get_executor') as executor:
+            thumbnails.queue_all(self.post.image)
+        executor.assert_not_called()
+        image = get_thumbnail(
+            self.post.image, '480x270',
+            crop='center', upscale=True, format='WEBP',
+        )
+        self.assertTrue(image.name.endswith('.webp'))
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_built_images_invalidate_fragments(self):
+        """Lists cached with the original are dropped once all is built."""
+        executor = ThreadPoolExecutor(max_workers=2)
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda submit: submit()
+        ), mock.patch.object(
+            thumbnails, 'get_executor', return_value=executor
+        ), mock.patch.object(
+            thumbnails, 'bump_fragments_version'
+        ) as bump:
+            thumbnails.queue_all(self.post.image)
+            executor.shutdown(wait=True)
+        bump.assert_called_once_with()
+        self.assertFalse(thumbnails._queued)
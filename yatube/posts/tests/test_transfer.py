@@ -0,0 +1,106 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, FeedEntry, Follow, Group, Post, User, UserStats
+from ..transfer import DATASETS, Checkpoint
+
+
+class TransferTests(TestCase):
+    """Export and import commands tests."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание, "с" кавычками'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первая строка\nвторая'
+        )
+        cls.other_post = Post.objects.create(author=cls.author, text='Без')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def path(self, dataset, extension):
+        return os.path.join(self.directory, f'{dataset}.{extension}')
+
+    def snapshot(self):
+        return {
+            dataset: list(model.objects.order_by('pk').values(*fields))
+            for dataset, (model, fields) in DATASETS.items()
+        }
+
+    def round_trip(self, extension):
+        before = self.snapshot()
+        for dataset in DATASETS:
+            call_command('export_data', dataset, self.path(dataset, extension),
+                         batch_size=1, stdout=StringIO())
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        for dataset in DATASETS:
+            call_command('import_data', dataset,
+                         self.path(dataset, extension), batch_size=2,
+                         stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(UserStats.objects.get(user=self.author).posts_count,
+                         2)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 1)
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(),
+                         2)
+        self.assertFalse([
+            name for name in os.listdir(self.directory)
+            if name.endswith('.checkpoint')
+        ])
+
+    def test_round_trip_ndjson(self):
+        """NDJSON export and import keep every row as it was."""
+        self.round_trip('ndjson')
+
+    def test_round_trip_csv(self):
+        """CSV keeps newlines in texts and empty groups."""
+        self.round_trip('csv')
+
+    def test_export_resume(self):
+        """Resumed export drops the unfinished batch and finishes the file."""
+        full = self.path('full', 'ndjson')
+        call_command('export_data', 'posts', full, stdout=StringIO())
+        with open(full, 'rb') as source:
+            first = source.readline()
+
+        path = self.path('posts', 'ndjson')
+        with open(path, 'wb') as output:
+            output.write(first + b'{"id": ')
+        Checkpoint(path).save(last_pk=self.post.pk, offset=len(first),
+                              rows=1)
+        call_command('export_data', 'posts', path, resume=True,
+                     stdout=StringIO())
+        with open(path, 'rb') as resumed, open(full, 'rb') as expected:
+            self.assertEqual(resumed.read(), expected.read())
+        self.assertIsNone(Checkpoint(path).load())
+
+    def test_import_resume(self):
+        """Resumed import skips the batches done before."""
+        path = self.path('posts', 'ndjson')
+        call_command('export_data', 'posts', path, stdout=StringIO())
+        with open(path, 'rb') as source:
+            offset = len(source.readline())
+        Post.objects.all().delete()
+        Checkpoint(path).save(offset=offset, rows=1)
+
+        call_command('import_data', 'posts', path, resume=True,
+                     rebuild=False, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.values_list('pk', flat=True)),
+            [self.other_post.pk],
+        )
@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import uploads
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file(name, size, mode='RGB', image_format='JPEG', exif=None):
+    content = BytesIO()
+    options = {'exif': exif.tobytes()} if exif is not None else {}
+    Image.new(mode, size, 'red').save(content, image_format, **options)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_MAX_PIXELS=10000,
+    POST_IMAGE_MAX_SIDE=50,
+)
+class UploadTests(TestCase):
+    """Image upload limits and normalization."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Text', 'image': image}
+        )
+
+    def test_stored_image_is_normalized(self):
+        """Images are stored downscaled and without EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Phone'
+        self.create(image_file('photo.jpeg', (100, 40), exif=exif))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (50, 20))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_identical_uploads_stored_once(self):
+        for _ in range(2):
+            self.create(image_file('photo.jpg', (30, 30)))
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertRegex(names.pop(), r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+
+    def test_orientation_is_applied(self):
+        exif = Image.Exif()
+        # Rotated by 90 degrees.
+        exif[0x0112] = 6
+        image = uploads.normalize(
+            image_file('photo.jpg', (40, 20), exif=exif)
+        )
+        with Image.open(image) as image:
+            self.assertEqual(image.size, (20, 40))
+
+    def test_transparency_is_kept(self):
+        image = uploads.normalize(
+            image_file('logo.gif', (20, 20), 'RGBA', 'PNG')
+        )
+        self.assertEqual(image.name, 'logo.png')
+        with Image.open(image) as image:
+            self.assertEqual(image.mode, 'RGBA')
+
+    def test_too_many_pixels(self):
+        response = self.create(image_file('large.jpg', (200, 200)))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение слишком большое: 200×200 точек.',
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(UPLOAD_MAX_BYTES=100)
+    def test_too_many_bytes(self):
+        response = self.create(image_file('heavy.jpg', (20, 20)))
+        errors = response.context['form'].errors.as_data()['image']
+        self.assertEqual([error.code for error in errors], ['file_too_large'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_handler_drops_data_over_limit(self):
+        handler = uploads.LimitedUploadHandler()
+        with self.settings(UPLOAD_MAX_BYTES=10):
+            handler.new_file('image', 'a.jpg', 'image/jpeg', None)
+            self.assertEqual(handler.receive_data_chunk(b'x' * 8, 0), b'x' * 8)
+            self.assertIsNone(handler.receive_data_chunk(b'x' * 8, 8))
+            upload = handler.file_complete(16)
+        self.assertTrue(uploads.is_oversized(upload))
+        self.assertEqual(upload.size, 16)
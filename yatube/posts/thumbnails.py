@@ -0,0 +1,214 @@
+"""Thumbnails built ahead of time.
+
+Saving a post with an image queues every responsive variant from
+settings.POST_IMAGE_VARIANTS to a thread pool. The sorl-thumbnail backend
+used by templates only returns thumbnails that already exist; a missing
+one is queued and the original image is served in the meantime, so no
+request ever decodes or resizes an image itself. Once every queued
+variant of an image is built, the fragments version is bumped, so post
+lists cached with the original meanwhile are rendered again. With
+settings.THUMBNAIL_WORKERS = 0 there is no pool, thumbnails are built by
+the thread that commits, so none is still being written after it.
+
+resolve_many() looks the thumbnails of a whole page of images up in the
+key-value store of sorl at once, instead of one lookup per thumbnail.
+"""
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from .cache import bump_fragments_version
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+# Variants queued per image name.
+_queued = Counter()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def variants():
+    """(width, format, geometry, options) of every responsive variant."""
+    config = settings.POST_IMAGE_VARIANTS
+    ratio_width, ratio_height = config['ratio']
+    for image_format in config['formats']:
+        for width in config['widths']:
+            height = width * ratio_height // ratio_width
+            options = {
+                'crop': 'center',
+                'upscale': True,
+                'format': image_format,
+            }
+            yield width, image_format, f'{width}x{height}', options
+
+
+def specs():
+    """(geometry, options) of every thumbnail built for a post image."""
+    for _, _, geometry, options in variants():
+        yield geometry, options
+
+
+def build(file_, geometry, options):
+    """Generate one thumbnail right now, in the calling thread."""
+    return ThumbnailBackend().get_thumbnail(file_, geometry, **options)
+
+
+def build_all(file_):
+    """Generate every standard thumbnail of an image."""
+    for geometry, options in specs():
+        build(file_, geometry, dict(options))
+
+
+def _build_logged(file_, geometry, options):
+    try:
+        build(file_, geometry, options)
+    except Exception:
+        logger.exception('Thumbnail %s of %s failed', geometry, file_)
+
+
+def _done(key, name):
+    """Count a variant out, bump fragments after the last one of name."""
+    with _executor_lock:
+        _pending.discard(key)
+        _queued[name] -= 1
+        last = not _queued[name]
+        if last:
+            del _queued[name]
+    if last:
+        bump_fragments_version()
+
+
+def _run(key, file_, geometry, options):
+    try:
+        _build_logged(file_, geometry, options)
+    finally:
+        _done(key, file_.name)
+        close_old_connections()
+
+
+def queue(file_, geometry, options):
+    """Generate a thumbnail in the background, once per image and size.
+
+    Work starts when the current transaction commits, so workers never
+    race a request for the database, and never start for a rollback.
+    """
+    key = (file_.name, geometry, repr(sorted(options.items())))
+    options = dict(options)
+
+    def submit():
+        with _executor_lock:
+            if key in _pending:
+                return
+            _pending.add(key)
+            _queued[file_.name] += 1
+        if not settings.THUMBNAIL_WORKERS:
+            try:
+                _build_logged(file_, geometry, options)
+            finally:
+                _done(key, file_.name)
+            return
+        get_executor().submit(_run, key, file_, geometry, options)
+    transaction.on_commit(submit)
+
+
+def queue_all(file_):
+    """Queue every standard thumbnail of an image."""
+    for geometry, options in specs():
+        queue(file_, geometry, options)
+
+
+class PrebuiltThumbnailBackend(ThumbnailBackend):
+    """Backend that never builds a thumbnail inside a request."""
+
+    def thumbnail_name(self, source, geometry_string, options):
+        """Name ThumbnailBackend stores the thumbnail under."""
+        options = dict(options)
+        # Same option defaults as ThumbnailBackend, so the name matches
+        # the one the worker stores.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        requested = dict(options)
+
+        name = self.thumbnail_name(source, geometry_string, options)
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        if cached:
+            return cached
+
+        if source.exists():
+            queue(file_, geometry_string, requested)
+        return source
+
+
+def resolve_many(images):
+    """Built thumbnails of every variant of images, in one lookup.
+
+    Returns {(image name, geometry, format): thumbnail}. The cache of the
+    sorl key-value store is read with one get_many, what it misses with
+    one database query. Thumbnails not built yet are left out, callers
+    fall back to get_thumbnail() for them, which queues them. Key-value
+    stores without a Django cache are not batched at all.
+    """
+    cache = getattr(default.kvstore, 'cache', None)
+    if cache is None:
+        return {}
+    backend = PrebuiltThumbnailBackend()
+    keys = {}
+    for image in {image.name: image for image in images if image}.values():
+        source = ImageFile(image)
+        for _, image_format, geometry, options in variants():
+            name = backend.thumbnail_name(source, geometry, options)
+            key = add_prefix(ImageFile(name, default.storage).key)
+            keys[key] = (image.name, geometry, image_format)
+    if not keys:
+        return {}
+
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(
+            KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+        )
+        cache.set_many(stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(stored)
+
+    # Known missing thumbnails are cached as a marker class, not a string.
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in values.items()
+        if isinstance(value, str)
+    }
@@ -0,0 +1,245 @@
+"""Streaming export and import of posts data.
+
+Rows are read in pk ordered keyset batches and written as NDJSON or CSV,
+and read back line by line into batched bulk_create calls, so memory does
+not depend on the size of a table. After every batch a checkpoint file
+next to the data file records how far the work got; a run with resume
+continues from there. Primary keys are kept, so references between
+datasets stay valid and importing a batch twice changes nothing.
+"""
+import csv
+import io
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from . import counters, feed
+from .cache import bump_fragments_version
+from .models import Comment, Follow, Group, Post, User
+from .search import get_backend
+
+# Import in this order, later datasets refer to earlier ones.
+DATASETS = {
+    'users': (User, (
+        'id', 'username', 'password', 'first_name', 'last_name', 'email',
+        'is_active', 'is_staff', 'is_superuser', 'date_joined',
+    )),
+    'groups': (Group, ('id', 'title', 'slug', 'description')),
+    'posts': (Post, (
+        'id', 'author_id', 'group_id', 'text', 'pub_date', 'image',
+    )),
+    'comments': (Comment, ('id', 'post_id', 'author_id', 'text', 'created')),
+    'follows': (Follow, ('id', 'user_id', 'author_id')),
+}
+FORMATS = ('ndjson', 'csv')
+
+
+@contextmanager
+def explicit_dates():
+    """Let bulk_create keep the dates set on objects."""
+    fields = (
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    )
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def chunks(objects, size):
+    chunk = []
+    for obj in objects:
+        chunk.append(obj)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def guess_format(path):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return 'csv' if extension == 'csv' else 'ndjson'
+
+
+class Checkpoint:
+    """Progress of a transfer, stored next to its data file."""
+
+    def __init__(self, path):
+        self.path = f'{path}.checkpoint'
+
+    def load(self):
+        try:
+            with open(self.path) as checkpoint:
+                return json.load(checkpoint)
+        except FileNotFoundError:
+            return None
+
+    def save(self, **state):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _isoformat(value):
+    # DjangoJSONEncoder would cut datetimes to milliseconds.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _encode(rows, fields, data_format):
+    if data_format == 'ndjson':
+        return ''.join(
+            json.dumps(row, default=_isoformat, ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerows(
+        [_csv_value(row[field]) for field in fields] for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def export(dataset, path, data_format, batch_size=5000, resume=False):
+    """Write dataset to path, return the number of rows written."""
+    model, fields = DATASETS[dataset]
+    checkpoint = Checkpoint(path)
+    state = checkpoint.load() if resume else None
+    if state is None:
+        state = {'last_pk': 0, 'offset': 0, 'rows': 0}
+        with open(path, 'wb') as output:
+            if data_format == 'csv':
+                output.write((','.join(fields) + '\n').encode())
+            state['offset'] = output.tell()
+        checkpoint.save(**state)
+
+    with open(path, 'r+b') as output:
+        # Drop whatever was written after the last checkpoint.
+        output.truncate(state['offset'])
+        output.seek(state['offset'])
+        queryset = model.objects.order_by('pk').values(*fields)
+        while True:
+            rows = list(
+                queryset.filter(pk__gt=state['last_pk'])[:batch_size]
+            )
+            if not rows:
+                break
+            output.write(_encode(rows, fields, data_format))
+            output.flush()
+            os.fsync(output.fileno())
+            state = {
+                'last_pk': rows[-1]['id'],
+                'offset': output.tell(),
+                'rows': state['rows'] + len(rows),
+            }
+            checkpoint.save(**state)
+    checkpoint.clear()
+    return state['rows']
+
+
+class _CountingLines:
+    """Decoded lines of a binary file, counting the bytes consumed."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.offset = stream.tell()
+
+    def __iter__(self):
+        for line in self.stream:
+            self.offset += len(line)
+            yield line.decode()
+
+
+def _records(lines, data_format, header):
+    if data_format == 'ndjson':
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        for values in csv.reader(lines):
+            yield dict(zip(header, values))
+
+
+def _build(model, fields, record, data_format):
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        value = record.get(name)
+        if data_format == 'csv' and value == '' and field.null:
+            value = None
+        values[field.attname] = field.to_python(value)
+    return model(**values)
+
+
+def _reset_sequences(model):
+    """Next ids must follow the imported ones, on databases with sequences."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def import_(dataset, path, data_format, batch_size=5000, resume=False):
+    """Load dataset from path, return the number of rows read."""
+    model, fields = DATASETS[dataset]
+    checkpoint = Checkpoint(path)
+    state = (checkpoint.load() if resume else None) or {
+        'offset': 0, 'rows': 0,
+    }
+
+    with open(path, 'rb') as source:
+        header = None
+        if data_format == 'csv':
+            header = next(csv.reader([source.readline().decode()]))
+        source.seek(max(state['offset'], source.tell()))
+        lines = _CountingLines(source)
+        records = _records(lines, data_format, header)
+        with explicit_dates():
+            for batch in chunks(records, batch_size):
+                objects = [
+                    _build(model, fields, record, data_format)
+                    for record in batch
+                ]
+                with transaction.atomic():
+                    model.objects.bulk_create(objects, ignore_conflicts=True)
+                state = {
+                    'offset': lines.offset,
+                    'rows': state['rows'] + len(objects),
+                }
+                checkpoint.save(**state)
+    _reset_sequences(model)
+    checkpoint.clear()
+    return state['rows']
+
+
+def rebuild_derived():
+    """Recompute what signals maintain, bulk_create sends none."""
+    counters.rebuild_users(User.objects.all())
+    counters.rebuild_posts(Post.objects.all())
+    counters.rebuild_groups(Group.objects.all())
+    feed.rebuild()
+    get_backend().rebuild()
+    bump_fragments_version()
@@ -0,0 +1,111 @@
+"""Bounded image uploads.
+
+LimitedUploadHandler stops keeping an upload once it passes
+settings.UPLOAD_MAX_BYTES, whatever the size the client claims, and
+hands an OversizedUpload to the form instead. normalize() checks the
+pixel count from the image header before anything is decoded, then
+stores a downscaled, EXIF free copy, so thumbnail workers and clients
+only ever get bounded images.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            UploadedFile)
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+
+class OversizedUpload(UploadedFile):
+    """Stand-in for an upload over the limit, its data is dropped."""
+    oversized = True
+
+    def __init__(self, name, content_type, size):
+        super().__init__(BytesIO(), name, content_type, size)
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Drop uploads over settings.UPLOAD_MAX_BYTES while they stream in.
+
+    Keep it first in FILE_UPLOAD_HANDLERS: chunks it holds back never
+    reach the handlers storing them in memory or on disk.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received <= settings.UPLOAD_MAX_BYTES:
+            return None
+        return OversizedUpload(
+            self.file_name, self.content_type, self.received
+        )
+
+
+def is_oversized(file_):
+    return getattr(file_, 'oversized', False)
+
+
+def check_pixels(image):
+    """Reject images over settings.POST_IMAGE_MAX_PIXELS.
+
+    Image.open only reads the header, the size is known before decoding.
+    """
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение слишком большое: %(width)s×%(height)s точек.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+
+
+def normalize(file_):
+    """Bounded copy of an uploaded image, without EXIF and other metadata.
+
+    Images are turned by their EXIF orientation and scaled down to fit
+    settings.POST_IMAGE_MAX_SIDE. Images with transparency are stored as
+    PNG, the others as JPEG.
+    """
+    file_.seek(0)
+    image = Image.open(file_)
+    check_pixels(image)
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    scale = min(1, max_side / max(image.size))
+    # JPEGs are decoded at the smallest scale still above the target.
+    image.draft('RGB', (image.width * scale, image.height * scale))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    transparent = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    # Colour profiles are kept, they say nothing about the author.
+    options = {'icc_profile': image.info.get('icc_profile')}
+    content = BytesIO()
+    if transparent:
+        image.convert('RGBA').save(content, 'PNG', optimize=True, **options)
+        extension, content_type = 'png', 'image/png'
+    else:
+        image.convert('RGB').save(
+            content, 'JPEG',
+            quality=settings.POST_IMAGE_QUALITY, optimize=True, **options
+        )
+        extension, content_type = 'jpg', 'image/jpeg'
+    name = '{}.{}'.format(
+        os.path.splitext(os.path.basename(file_.name))[0], extension
+    )
+    size = content.tell()
+    content.seek(0)
+    return InMemoryUploadedFile(
+        content, 'image', name, content_type, size, None
+    )
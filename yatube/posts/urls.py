@@ -11,6 +11,11 @@ urlpatterns = [
         views.index,
         name='index'
     ),
+    path(
+        'group/',
+        views.groups,
+        name='groups'
+    ),
     path(
         'group/<slug:slug>/',
         views.group_posts,
@@ -21,11 +26,21 @@ urlpatterns = [
         views.profile,
         name='profile'
     ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
     path(
         'posts/<int:post_id>/',
         views.post_detail,
         name='post_detail'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'create/',
         views.post_create,
@@ -0,0 +1,157 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(value, pk):
+    """Pack a (timestamp, id) pair into an url-safe token."""
+    raw = f'{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Unpack a token made by encode_cursor, None if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit('|', 1)
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPage:
+    """Page of a keyset paginated queryset.
+
+    Mimics the parts of django Page that templates use, but knows only
+    its neighbours, not its number or the total count.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage after {} before {}>'.format(
+            self.previous_cursor, self.next_cursor
+        )
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class CursorPaginator:
+    """Keyset paginator over a (timestamp, id) pair.
+
+    Every page is a single indexed range read, so its cost does not
+    depend on how deep the page is. `after` walks to older objects,
+    `before` to newer ones. tiebreak may name another column equal to
+    pk, one that the index used for the page contains. object_list may
+    be a values() queryset, its rows must then include field and id.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreak='pk'):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.field = field
+        self.tiebreak = tiebreak
+
+    def _cursor(self, obj):
+        if isinstance(obj, dict):
+            return encode_cursor(obj[self.field], obj['id'])
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    def _older(self, value, pk):
+        return (
+            Q(**{f'{self.field}__lt': value})
+            | Q(**{self.field: value, f'{self.tiebreak}__lt': pk})
+        )
+
+    def _newer(self, value, pk):
+        return (
+            Q(**{f'{self.field}__gt': value})
+            | Q(**{self.field: value, f'{self.tiebreak}__gt': pk})
+        )
+
+    def get_page(self, after=None, before=None):
+        """Return the page after or before the given cursor.
+
+        Malformed cursors are treated as missing, like Paginator.get_page
+        does with invalid numbers.
+        """
+        after = after and decode_cursor(after)
+        before = before and decode_cursor(before)
+        descending = ('-' + self.field, '-' + self.tiebreak)
+        ascending = (self.field, self.tiebreak)
+
+        if before:
+            queryset = self.object_list.filter(
+                self._newer(*before)
+            ).order_by(*ascending)
+            objects = list(queryset[:self.per_page + 1])
+            has_more = len(objects) > self.per_page
+            objects = objects[:self.per_page][::-1]
+            has_older = True
+            has_newer = has_more
+        else:
+            queryset = self.object_list.order_by(*descending)
+            if after:
+                queryset = queryset.filter(self._older(*after))
+            objects = list(queryset[:self.per_page + 1])
+            has_older = len(objects) > self.per_page
+            objects = objects[:self.per_page]
+            has_newer = bool(after)
+
+        next_cursor = previous_cursor = None
+        if objects and has_older:
+            next_cursor = self._cursor(objects[-1])
+        if objects and has_newer:
+            previous_cursor = self._cursor(objects[0])
+        return CursorPage(objects, self, next_cursor, previous_cursor)
+
+
+def paginate(request, object_list, per_page, count=None,
+             keys=('pub_date', 'pk')):
+    """Paginate object_list by the request query string.
+
+    Uses keyset pagination over keys when the request carries a cursor
+    or when settings.POSTS_PAGINATION is 'cursor', numbered pages
+    otherwise. A known count saves numbered pagination its COUNT(*) query.
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before or settings.POSTS_PAGINATION == 'cursor':
+        paginator = CursorPaginator(object_list, per_page, *keys)
+        return paginator.get_page(after=after, before=before)
+
+    paginator = Paginator(object_list, per_page)
+    if count is not None:
+        paginator.count = count
+    return paginator.get_page(request.GET.get('page'))
@@ -1,49 +1,110 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db.models import OuterRef, Subquery
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.urls import reverse
+
+from core.singleflight import coalesce_view
 
+from .cache import fragment_context, fragments_version
+from .conditional import cache_policy, newest
+from .counters import group_stats, top_authors, user_stats
+from .feed import feed_posts
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, GroupStats, Post, User
+from .search import get_backend as get_search_backend
+from .utils import CursorPaginator, paginate
 
 POSTS_ON_PAGE = 10
-
-
-@cache_page(20, key_prefix='index_page')
+COMMENTS_ON_PAGE = 20
+GROUPS_ON_PAGE = 20
+
+
+def latest_activity(request, post_id):
+    """Date of the post or of its newest comment."""
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-created').values('created')[:1]
+    dates = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).values_list('pub_date', 'last_comment').first()
+    return max(date for date in dates if date) if dates else None
+
+
+@cache_policy(lambda request: newest(Post.objects, 'pub_date'))
+@coalesce_view(
+    settings.POSTS_INDEX_TIMEOUT,
+    settings.POSTS_INDEX_STALE_TIMEOUT,
+    version=fragments_version,
+)
 def index(request):
     """View function for main page"""
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.cards()
+    page_obj = paginate(request, post_list, POSTS_ON_PAGE)
     context = {
         'page_obj': page_obj,
+        **fragment_context(),
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_policy(lambda request, slug: newest(
+    Post.objects.filter(group__slug=slug), 'pub_date'
+))
 def group_posts(request, slug):
     """View function for group page"""
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = get_object_or_404(
+        Group.objects.select_related('stats'), slug=slug
+    )
+    stats = group_stats(group)
+    post_list = group.posts.cards()
+    page_obj = paginate(
+        request, post_list, POSTS_ON_PAGE, count=stats.posts_count
+    )
     context = {
         'group': group,
+        'stats': stats,
+        'top_authors': top_authors([group.pk])[group.pk],
         'page_obj': page_obj,
+        **fragment_context(),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_policy(lambda request: newest(GroupStats.objects, 'last_post_date'))
+def groups(request):
+    """View function for the groups directory"""
+    stats = GroupStats.objects.select_related('group').order_by(
+        '-last_post_date', '-group_id'
+    )
+    paginator = Paginator(stats, GROUPS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    authors = top_authors([row.group_id for row in page_obj])
+    for row in page_obj:
+        row.top_authors = authors[row.group_id]
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/groups.html', context)
+
+
+@cache_policy(lambda request, username: newest(
+    Post.objects.filter(author__username=username), 'pub_date'
+))
 def profile(request, username):
     """View function for profile page"""
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    total_posts = posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = user_stats(author)
+    posts = author.posts.cards()
+    page_obj = paginate(
+        request, posts, POSTS_ON_PAGE, count=stats.posts_count
+    )
 
     following = request.user.is_authenticated and Follow.objects.filter(
         author_id=author.id,
@@ -52,22 +113,38 @@ def profile(request, username):
 
     context = {
         'page_obj': page_obj,
-        'total_posts': total_posts,
+        'total_posts': stats.posts_count,
+        'stats': stats,
         'author': author,
         'following': following,
+        **fragment_context(),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    """View function for search page"""
+    query = request.GET.get('q', '').strip()
+    results = get_search_backend().search(query) if query else []
+    paginator = Paginator(results, POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@cache_policy(latest_activity)
 def post_detail(request, post_id):
     """View function for post page"""
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.cards(), id=post_id)
     title = post.text[:30]
-    author = post.author
-    total_posts = author.posts.count()
+    total_posts = user_stats(post.author).posts_count
 
     comment_form = CommentForm()
-    comments = post.comments.all()
+    comments = comment_page(request, post)
     context = {
         'post': post,
         'title': title,
@@ -78,6 +155,35 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_page(request, post):
+    """Newest comments of post, older ones follow the after cursor."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), COMMENTS_ON_PAGE, 'created'
+    )
+    return paginator.get_page(after=request.GET.get('after'))
+
+
+def post_comments(request, post_id):
+    """Next page of comments as JSON, for the load more button."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    page = comment_page(request, post)
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'author_url': reverse(
+                    'posts:profile', args=(comment.author.username,)
+                ),
+                'text': comment.text,
+                'created': comment.created,
+            }
+            for comment in page
+        ],
+        'next': page.next_cursor,
+    })
+
+
 @login_required
 def post_create(request):
     """View function for post create page"""
@@ -135,21 +241,27 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def user_feed(request):
+    """feed_posts of the user, its celebrities are looked up once."""
+    if not hasattr(request, 'feed_posts'):
+        request.feed_posts = feed_posts(request.user)
+    return request.feed_posts
+
+
 @login_required
+@cache_policy(lambda request: newest(user_feed(request), 'feed_date'))
 def follow_index(request):
     """The same as index page but only with following authors."""
-
-    # I Don't really think it is perfect
-    follows = Follow.objects.filter(user_id=request.user.id)
-    ids = follows.values_list('author_id')
-
-    posts = Post.objects.filter(author__id__in=ids)
-    paginator = Paginator(posts, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = user_feed(request).cards()
+    page_obj = paginate(
+        request, posts, POSTS_ON_PAGE, keys=('feed_date', 'feed_post')
+    )
 
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        # The feed is the user's own, so are its fragments.
+        'feed_owner': request.user.pk,
+        **fragment_context(),
     }
     return render(request, 'posts/follow_index.html', context)
 
@@ -157,12 +269,10 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     user = get_object_or_404(User, username=username)
-    does_exist = Follow.objects.filter(
-        user=request.user,
-        author=user,
-    ).exists()
-    if request.user != user and not does_exist:
-        Follow.objects.create(
+    if request.user != user:
+        # A concurrent click may create the row first, get_or_create
+        # then reads it instead of failing on unique_follow.
+        Follow.objects.get_or_create(
             user=request.user,
             author=user,
         )
@@ -31,6 +31,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that it measures every other middleware too.
+    'core.metrics.MetricsMiddleware',
+    'core.replicas.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,6 +42,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    # Last, so that it fills holes of responses any cache returned.
+    'core.holes.HoleMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -56,11 +61,29 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.fragments.header',
             ],
         },
     },
 ]
 
+# Production template mode: templates are parsed once per process by the
+# cached loader, all of them when the process starts, and includes of
+# templates up to TEMPLATE_INLINE_MAX_SIZE characters are inlined, see
+# core.loaders.
+TEMPLATES_PRODUCTION = os.environ.get('YATUBE_TEMPLATES_PRODUCTION') == '1'
+TEMPLATE_INLINE_MAX_SIZE = 4096
+if TEMPLATES_PRODUCTION:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('core.loaders.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+    # The toolbar finds its templates through app_directories all the same.
+    SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W006']
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
@@ -70,6 +93,46 @@ DATABASES = {
     }
 }
 
+# Read replicas, comma separated SQLite files in YATUBE_SQLITE_REPLICAS.
+# They are filled from default by the sync_replicas command, tests read
+# default through them.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get('YATUBE_SQLITE_REPLICAS', '').split(',')),
+    start=1,
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+# Production mode tunes SQLite for concurrent readers and writers, and
+# keeps connections open between requests. core.sqlite applies the
+# pragmas to every new connection. WAL stays on in the file once set.
+SQLITE_PRODUCTION = os.environ.get('YATUBE_SQLITE_PRODUCTION') == '1'
+SQLITE_PRAGMAS = {}
+if SQLITE_PRODUCTION:
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'wal',
+        # Safe with WAL: a power loss may drop the last commits, but
+        # never corrupts the database.
+        'synchronous': 'normal',
+        # Negative means KiB, 64 MB of page cache per connection.
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'busy_timeout': 5000,
+        'temp_store': 'memory',
+    }
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 600
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Reads of a client stay on default this long after it writes, longer
+# than replicas take to catch up.
+REPLICA_PIN_SECONDS = 10
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,6 +165,21 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads over UPLOAD_MAX_BYTES are dropped while they stream in, see
+# posts.uploads.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+
+# Post images are named by the sha256 of their content, see core.storage,
+# and thumbnails by a hash of their source, so their URLs never change
+# content. Media served by Django is cached that long, a front server
+# should send the same Cache-Control for those names.
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -110,11 +188,108 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+TEST_RUNNER = 'core.runner.TestRunner'
+
+# YATUBE_CACHE picks the cache: 'sqlite' is one file all processes of the
+# host share, 'two-tier' keeps a small LRU in each process in front of
+# that file, 'locmem' is private to every process. The fragments version
+# and ETags live in the cache, with 'locmem' a write is only seen by the
+# process that served it, so it is for a single process only. The shared
+# file is YATUBE_CACHE_PATH.
+CACHE_MODE = os.environ.get('YATUBE_CACHE', 'sqlite')
+CACHE_PATH = os.environ.get(
+    'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+)
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+if CACHE_MODE == 'sqlite':
+    CACHES['default'] = {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': CACHE_PATH,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+elif CACHE_MODE == 'two-tier':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.TwoTierCache',
+            'LOCATION': 'shared',
+            # Bounds how long a process may keep an entry the shared
+            # tier has expired in the meantime.
+            'TIMEOUT': 30,
+            'OPTIONS': {'MAX_ENTRIES': 1000, 'SYNC_INTERVAL': 1},
+        },
+        'shared': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': CACHE_PATH,
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+
+# Post list fragments are invalidated by version bumps on writes, the
+# timeout only bounds how long unused fragments occupy the cache.
+POSTS_FRAGMENTS_TIMEOUT = 60 * 10
+
+# The navigation of the header is cached per user and page, it changes
+# with neither posts nor follows.
+HEADER_FRAGMENT_TIMEOUT = 60 * 10
+
+# Seconds browsers and proxies may reuse pages served to guests, and
+# browsers pages of logged in users, before revalidating them with
+# If-None-Match. Revalidation of an unchanged page costs one query.
+POSTS_PUBLIC_MAX_AGE = 60
+POSTS_PRIVATE_MAX_AGE = 0
+
+# The index served to guests is computed by one request at a time, see
+# core.singleflight. After a write or the timeout, the previous page is
+# served for up to the stale timeout while it is computed again.
+POSTS_INDEX_TIMEOUT = 20
+POSTS_INDEX_STALE_TIMEOUT = 60
+
+# 'numbered' keeps ?page=N links, 'cursor' switches post lists to keyset
+# pagination with constant cost per page.
+POSTS_PAGINATION = 'numbered'
+
+# Authors with more followers than this are merged into follow feeds on
+# read instead of being copied into every follower's feed on write. They
+# are copied again once they are FEED_FANOUT_HYSTERESIS followers under
+# the limit and the fan_out_feeds command ran, run it from cron.
+FEED_FANOUT_LIMIT = 1000
+FEED_FANOUT_HYSTERESIS = 100
+
+# posts.search.SQLiteFTS5Backend needs SQLite with FTS5, use
+# posts.search.SimpleSearchBackend on other databases.
+POSTS_SEARCH_BACKEND = 'posts.search.SQLiteFTS5Backend'
+# Search ranks at most this many best matches.
+POSTS_SEARCH_MAX_RESULTS = 1000
+
+# Templates only read thumbnails built ahead by posts.thumbnails workers.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PrebuiltThumbnailBackend'
+# Threads building thumbnails in the background. 0 builds them when the
+# saving transaction commits, in its own thread, core.runner sets it so
+# for tests.
+THUMBNAIL_WORKERS = 2
+# Responsive variants built for every post image and rendered into
+# srcset: every width in every format, cropped to ratio. The last format
+# is the <img> fallback for browsers that support none of the others.
+POST_IMAGE_VARIANTS = {
+    'widths': (480, 960, 1440, 1920),
+    'ratio': (16, 9),
+    'formats': ('WEBP', 'JPEG'),
+}
+# Post images with more pixels are rejected before they are decoded, the
+# others are stored scaled down to fit POST_IMAGE_MAX_SIDE, as JPEG of
+# POST_IMAGE_QUALITY unless they have transparency, and without EXIF.
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_QUALITY = 85
+# Default sizes attribute: post images span the bootstrap container.
+POST_IMAGE_SIZES = (
+    '(min-width: 1200px) 1140px, (min-width: 992px) 960px, '
+    '(min-width: 768px) 720px, (min-width: 576px) 540px, 100vw'
+)
 
 INTERNAL_IPS = [
     '127.0.0.1',